@@ -1,38 +1,158 @@
 import requests
 import time
 import os
+import fnmatch
+import threading
+from requests.adapters import HTTPAdapter
 
 pdf_path = r"C:\project\satori_xr_report_summarizer\python_backend\data\input_pdfs\1737011904_Snapshot-of-Indias-Oil-and-Gas-Data_WebUpload_December-2024_compressed.pdf"
-upload_url = "http://localhost:8000/process-pdf/"
+base_url = "http://localhost:8000"
+upload_url = f"{base_url}/process-pdf/"
+status_url = f"{base_url}/task-status/{{task_id}}"
 output_dir = r"C:\project\satori_xr_report_summarizer\python_backend\data\output_summaries"
 
+# Reuse one keep-alive connection for the upload and every status poll
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10)
+session.mount("http://", adapter)
+session.mount("https://", adapter)
+session.headers.update({"Accept": "application/json"})
+
+def watch_for_file(directory, pattern):
+    """
+    Starts watching a directory for a finished file matching a glob pattern.
+
+    Uses inotify on Linux and watchdog elsewhere, so the wait is woken by the
+    kernel instead of polling. Must be called before the file can appear.
+
+    Returns:
+        A wait(timeout) callable returning the matched path or None on timeout,
+        or None if no file-event backend is available or the directory cannot
+        be watched.
+    """
+    # Checked up front, as watchdog's inotify backend leaks its fds when asked
+    # to watch a missing directory
+    if not os.path.isdir(directory):
+        return None
+
+    try:
+        from inotify_simple import INotify, flags
+    except ImportError:
+        INotify = None
+
+    ino = None
+    if INotify is not None:
+        try:
+            ino = INotify()
+            ino.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO)
+        except OSError:
+            # E.g. no inotify instances or watches left, so close the fd and
+            # try watchdog
+            if ino is not None:
+                ino.close()
+            ino = None
+
+    if ino is not None:
+        def wait_inotify(timeout):
+            deadline = time.monotonic() + timeout
+            try:
+                while (remaining := deadline - time.monotonic()) > 0:
+                    for event in ino.read(timeout=int(remaining * 1000)):
+                        if fnmatch.fnmatch(event.name, pattern):
+                            return os.path.join(directory, event.name)
+                return None
+            finally:
+                ino.close()
+
+        return wait_inotify
+
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import PatternMatchingEventHandler
+    except ImportError:
+        return None
+
+    found = {}
+    done = threading.Event()
+
+    class SummaryHandler(PatternMatchingEventHandler):
+        def on_closed(self, event):
+            self._found(event.src_path)
+
+        def on_modified(self, event):
+            self._found(event.src_path)
+
+        def on_moved(self, event):
+            self._found(event.dest_path)
+
+        def _found(self, path):
+            if fnmatch.fnmatch(os.path.basename(path), pattern):
+                found["path"] = path
+                done.set()
+
+    observer = Observer()
+    try:
+        observer.schedule(SummaryHandler(patterns=["*"], ignore_directories=True), directory)
+        observer.start()
+    except OSError:
+        # E.g. the output directory was removed since it was checked
+        observer.stop()
+        if observer.is_alive():
+            observer.join()
+        return None
+
+    def wait_watchdog(timeout):
+        try:
+            return found["path"] if done.wait(timeout) else None
+        finally:
+            observer.stop()
+            observer.join()
+
+    return wait_watchdog
+
+# Summaries are written as <stem>_summary_<timestamp>.json
+summary_pattern = os.path.splitext(os.path.basename(pdf_path))[0] + "_summary_*.json"
+wait_for_summary = watch_for_file(output_dir, summary_pattern)
+
 # Upload PDF
 with open(pdf_path, "rb") as f:
     files = {"file": (os.path.basename(pdf_path), f, "application/pdf")}
-    response = requests.post(upload_url, files=files)
+    response = session.post(upload_url, files=files)
 
 if not response.ok:
     print("❌ Upload failed:", response.status_code, response.text)
     exit(1)
 
-print("✅ Upload successful.")
+task_id = response.json()["task_id"]
+print(f"✅ Upload successful. Task ID: {task_id}")
 
-# Construct expected summary filename and path
-filename = os.path.splitext(os.path.basename(pdf_path))[0] + "_summary.txt"
-output_path = os.path.join(output_dir, filename)
-
-# Wait for summary file to appear (max wait time 30 seconds)
+# Wait for the summary (max wait time 30 seconds)
 max_wait = 30
-waited = 0
-interval = 2
 
-print("⏳ Waiting for summary file to be saved locally...")
+print("⏳ Waiting for summary to be generated...")
 
-while waited < max_wait:
-    if os.path.isfile(output_path):
+if wait_for_summary is not None:
+    output_path = wait_for_summary(max_wait)
+    if output_path:
         print(f"✅ Summary saved to: {output_path}")
-        break
-    time.sleep(interval)
-    waited += interval
+    else:
+        status = session.get(status_url.format(task_id=task_id)).json()
+        print(f"❌ Summary not found after waiting {max_wait} seconds (status: {status.get('status')}, error: {status.get('error', 'none')}).")
 else:
-    print(f"❌ Summary file not found after waiting {max_wait} seconds.")
+    # No file-event backend installed or the output directory cannot be
+    # watched, fall back to polling the task status
+    interval = 0.5
+    deadline = time.monotonic() + max_wait
+
+    while time.monotonic() < deadline:
+        status = session.get(status_url.format(task_id=task_id)).json()
+        if status.get("status") == "completed":
+            output_path = os.path.join(output_dir, status["output_file"])
+            print(f"✅ Summary saved to: {output_path}")
+            break
+        if status.get("status") == "error":
+            print(f"❌ Processing failed: {status.get('error', 'Unknown error')}")
+            break
+        time.sleep(interval)
+    else:
+        print(f"❌ Summary not ready after waiting {max_wait} seconds.")
@@ -1,18 +1,25 @@
 import os
-import json
+import sys
+import re
+import orjson
+import asyncio
+import concurrent.futures
+import shutil
+import time
 import uvicorn
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-import tempfile
-import shutil
+from typing import Dict, List, Any, Optional, Union
+import aiofiles
+import ijson
 
 # Import our modules
-from src.pdf_parser import process_pdf_report
-from src.gemini_summarizer import GeminiSummarizer
-from src.utils import ensure_directory_exists, generate_output_filename
+from src.tasks import summarize_task
+from src.pdf_parser import init_worker
+from src.task_store import TaskStatusStore
+from src.utils import atomic_write, ensure_directory_exists
 
 # Define paths
 BASE_DIR = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -39,8 +46,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store background tasks status
-background_tasks_status = {}
+# Summary filenames accepted by /summary/{filename}
+SUMMARY_FILENAME_PATTERN = re.compile(r"[\w.\-]+\.json")
+
+# Uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Uploads up to this size are handed to the worker as bytes, and only written
+# to disk for the reference copy once the response is sent
+SMALL_UPLOAD_SIZE = int(os.getenv("SMALL_UPLOAD_SIZE", str(4 * 1024 * 1024)))
+
+# Store background tasks status, in Redis when REDIS_URL is set
+task_store = TaskStatusStore(os.getenv("REDIS_URL"), ttl=int(os.getenv("TASK_STATUS_TTL", "86400")))
+task_store_janitor: Optional[asyncio.Task] = None
+
+# Listing info of every summary in OUTPUT_DIR keyed by filename. It is built
+# once at startup and kept in sync as summaries are written, so /summaries/
+# does not re-parse every file on every request
+SUMMARY_INDEX: Dict[str, Dict[str, Any]] = {}
+summary_index_mtime: Optional[int] = None
+summary_index_lock: Optional[asyncio.Lock] = None
+
+# A directory changed within this long of a scan may change again without
+# its mtime moving, as on filesystems with FAT's two-second timestamps
+MTIME_RESOLUTION_NS = 2_000_000_000
+
+# Summaries up to this size are parsed whole, larger ones are stream-parsed
+MAX_METADATA_SIZE = 256 * 1024
+
+# Parsing and the Gemini call are blocking, so they run in dedicated worker
+# processes and the event loop only awaits their results
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "4"))
+worker_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+@app.on_event("startup")
+async def start_worker_pool():
+    """Start the PDF worker processes"""
+    global worker_pool
+    worker_pool = concurrent.futures.ProcessPoolExecutor(max_workers=PDF_WORKERS, initializer=init_worker)
+
+@app.on_event("shutdown")
+async def stop_worker_pool():
+    """Stop the PDF worker processes"""
+    if worker_pool is not None:
+        worker_pool.shutdown(wait=False, cancel_futures=True)
+
+async def purge_task_status_forever(interval: int = 3600):
+    """Periodically drop expired task statuses from the local fallback store"""
+    while True:
+        await asyncio.sleep(interval)
+        await task_store.purge_expired()
+
+@app.on_event("startup")
+async def start_task_store_janitor():
+    """Start the task status janitor"""
+    global task_store_janitor
+    task_store_janitor = asyncio.create_task(purge_task_status_forever())
+
+@app.on_event("shutdown")
+async def close_task_store():
+    """Stop the janitor and close the task status store"""
+    if task_store_janitor is not None:
+        task_store_janitor.cancel()
+    await task_store.close()
 
 @app.get("/")
 async def root():
@@ -60,27 +128,37 @@ async def process_pdf(
     import uuid
     task_id = str(uuid.uuid4())
     
-    # Save the uploaded file temporarily
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+    filename = os.path.basename(file.filename)
+    # The worker gets a file of its own, so an overlapping upload with the
+    # same name cannot replace it before its task runs
+    pdf_path = os.path.join(str(INPUT_DIR), f"{task_id}_{filename}")
+    partial_path = f"{pdf_path}.part"
     try:
-        # Copy uploaded file to temp file
-        shutil.copyfileobj(file.file, temp_file)
-        temp_file.close()
-        
-        # Save a copy to input directory for reference
-        pdf_path = os.path.join(str(INPUT_DIR), file.filename)
-        shutil.copy(temp_file.name, pdf_path)
+        # Small uploads are parsed straight from memory. Anything larger is
+        # streamed into the input directory and that same file is handed to
+        # the worker, so the bytes are written exactly once
+        head = await file.read(SMALL_UPLOAD_SIZE + 1)
+        if len(head) <= SMALL_UPLOAD_SIZE:
+            pdf_source = head
+        else:
+            async with aiofiles.open(partial_path, "wb") as out:
+                await out.write(head)
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    await out.write(chunk)
+            os.replace(partial_path, pdf_path)
+            pdf_source = pdf_path
         
         # Add task to background processing
-        background_tasks_status[task_id] = {
+        await task_store.set(task_id, {
             "status": "processing", 
-            "filename": file.filename
-        }
+            "filename": filename
+        })
+        background_tasks.add_task(save_input_copy, pdf_source, filename)
         background_tasks.add_task(
             process_pdf_background, 
             task_id, 
-            temp_file.name, 
-            file.filename
+            pdf_source, 
+            filename
         )
         
         return {
@@ -90,108 +168,221 @@ async def process_pdf(
         }
         
     except Exception as e:
-        if os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
+def link_input_copy(pdf_path: str, filename: str) -> None:
+    """Put a copy of the upload at pdf_path under its original name in INPUT_DIR"""
+    copy_path = os.path.join(str(INPUT_DIR), filename)
+    tmp_path = f"{pdf_path}.copy"
+    try:
+        try:
+            # A hard link shares the bytes instead of writing them again
+            os.link(pdf_path, tmp_path)
+        except OSError:
+            shutil.copyfile(pdf_path, tmp_path)
+        os.replace(tmp_path, copy_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+async def save_input_copy(pdf_source: Union[str, bytes], filename: str):
+    """Keep a reference copy of an upload under its original name, after the response is sent"""
+    try:
+        if isinstance(pdf_source, bytes):
+            await asyncio.to_thread(atomic_write, os.path.join(str(INPUT_DIR), filename), pdf_source)
+        else:
+            await asyncio.to_thread(link_input_copy, pdf_source, filename)
+    except OSError as e:
+        print(f"Error keeping a copy of upload {filename}: {e}")
+
 @app.get("/task-status/{task_id}")
 async def get_task_status(task_id: str):
     """Check the status of a background processing task"""
-    if task_id not in background_tasks_status:
+    status = await task_store.get(task_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    return background_tasks_status[task_id]
+    return status
+
+def scan_summary_files() -> Dict[str, os.stat_result]:
+    """List the summary files in OUTPUT_DIR with their stat results"""
+    stats = {}
+    with os.scandir(str(OUTPUT_DIR)) as entries:
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.is_file():
+                try:
+                    stats[entry.name] = entry.stat()
+                except FileNotFoundError:
+                    # Removed since the directory was listed
+                    pass
+    return stats
+
+def read_summary_metadata(file_path: str, size: int) -> Dict[str, Any]:
+    """Read only the "metadata" object of a summary file"""
+    with open(file_path, "rb") as f:
+        if size > MAX_METADATA_SIZE:
+            # Stream-parse large summaries so memory stays bounded
+            return next(ijson.items(f, "metadata"), {})
+        data = orjson.loads(f.read())
+    return data.get("metadata", {}) if isinstance(data, dict) else {}
+
+async def read_summary_info(file: str, size: int) -> Optional[Dict[str, Any]]:
+    """Read the listing info of one summary file, or None if it is not valid JSON or is gone"""
+    file_path = os.path.join(str(OUTPUT_DIR), file)
+    try:
+        metadata = await asyncio.to_thread(read_summary_metadata, file_path, size)
+    except (ijson.JSONError, ValueError, OSError):
+        return None
+    return {
+        "filename": file,
+        "source_file": metadata.get("source_file", "Unknown"),
+        "timestamp": metadata.get("processing_timestamp", "Unknown"),
+        "model_used": metadata.get("model_used", "Unknown"),
+        "file_path": file_path
+    }
+
+def get_summary_index_lock() -> asyncio.Lock:
+    """The lock serializing changes to SUMMARY_INDEX, created on the server's event loop"""
+    global summary_index_lock
+    if summary_index_lock is None:
+        summary_index_lock = asyncio.Lock()
+    return summary_index_lock
+
+async def refresh_summary_index():
+    """Sync SUMMARY_INDEX with OUTPUT_DIR, parsing only summaries not indexed yet"""
+    global summary_index_mtime
+    
+    # One refresh at a time, so two cannot interleave their updates of the index
+    async with get_summary_index_lock():
+        started = time.time_ns()
+        
+        # Summaries are only ever added or removed, which updates the directory mtime
+        mtime = (await asyncio.to_thread(os.stat, str(OUTPUT_DIR))).st_mtime_ns
+        if mtime == summary_index_mtime:
+            return
+        
+        stats = await asyncio.to_thread(scan_summary_files)
+        for removed in SUMMARY_INDEX.keys() - stats.keys():
+            del SUMMARY_INDEX[removed]
+        
+        new_files = [file for file in stats if file not in SUMMARY_INDEX]
+        results = await asyncio.gather(*(read_summary_info(file, stats[file].st_size) for file in new_files))
+        for file, info in zip(new_files, results):
+            if info is not None:
+                SUMMARY_INDEX[file] = info
+        
+        # Keep the most recent summaries first
+        ordered = sorted(SUMMARY_INDEX.items(), key=lambda item: stats[item[0]].st_mtime_ns, reverse=True)
+        SUMMARY_INDEX.clear()
+        SUMMARY_INDEX.update(ordered)
+        
+        # Only a completed rebuild is remembered, and only once the directory
+        # mtime is old enough that a later change must move it
+        summary_index_mtime = mtime if started - mtime > MTIME_RESOLUTION_NS else None
+
+async def index_summary(status: Dict[str, Any]):
+    """Add the summary written by a completed task to the front of SUMMARY_INDEX"""
+    info = {
+        "filename": status["output_file"],
+        "source_file": status.get("source_file", "Unknown"),
+        "timestamp": status.get("timestamp", "Unknown"),
+        "model_used": status.get("model_used", "Unknown"),
+        "file_path": status["output_path"]
+    }
+    async with get_summary_index_lock():
+        SUMMARY_INDEX.pop(info["filename"], None)
+        older = list(SUMMARY_INDEX.items())
+        SUMMARY_INDEX.clear()
+        SUMMARY_INDEX[info["filename"]] = info
+        SUMMARY_INDEX.update(older)
+
+@app.on_event("startup")
+async def load_summary_index():
+    """Index the existing summaries once at startup"""
+    await refresh_summary_index()
 
 @app.get("/summaries/")
 async def list_summaries():
     """List all available summaries"""
-    summaries = []
-    
     try:
-        for file in os.listdir(str(OUTPUT_DIR)):
-            if file.endswith(".json"):
-                file_path = os.path.join(str(OUTPUT_DIR), file)
-                with open(file_path, "r", encoding="utf-8") as f:
-                    try:
-                        # Just read the metadata to avoid loading large files
-                        data = json.load(f)
-                        summary_info = {
-                            "filename": file,
-                            "source_file": data.get("metadata", {}).get("source_file", "Unknown"),
-                            "timestamp": data.get("metadata", {}).get("processing_timestamp", "Unknown"),
-                            "model_used": data.get("metadata", {}).get("model_used", "Unknown"),
-                            "file_path": file_path
-                        }
-                        summaries.append(summary_info)
-                    except json.JSONDecodeError:
-                        continue
+        await refresh_summary_index()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing summaries: {str(e)}")
     
-    return {"summaries": summaries}
+    return {"summaries": list(SUMMARY_INDEX.values())}
 
 @app.get("/summary/{filename}")
 async def get_summary(filename: str):
     """Get a specific summary by filename"""
+    # The file is sent as-is, so validate the name explicitly to prevent path traversal
+    if not SUMMARY_FILENAME_PATTERN.fullmatch(filename):
+        raise HTTPException(status_code=400, detail="Invalid summary filename")
+    
     file_path = os.path.join(str(OUTPUT_DIR), filename)
     
-    if not os.path.exists(file_path):
+    if not await asyncio.to_thread(os.path.isfile, file_path):
         raise HTTPException(status_code=404, detail="Summary not found")
     
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            summary = json.load(f)
-        return summary
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading summary: {str(e)}")
+    # Summaries are already JSON on disk, so stream the file instead of parsing and re-serializing it
+    return FileResponse(file_path, media_type="application/json")
 
-async def process_pdf_background(task_id: str, temp_file_path: str, original_filename: str):
-    """Background task to process a PDF file"""
+async def process_pdf_background(task_id: str, pdf_source: Union[str, bytes], original_filename: str):
+    """Background task to process a PDF file in the worker pool"""
     try:
-        # Process the PDF
-        report_data = process_pdf_report(temp_file_path)
-        
-        if "error" in report_data:
-            background_tasks_status[task_id] = {
-                "status": "error",
-                "filename": original_filename,
-                "error": report_data["error"]
-            }
-            return
-        
-        # Generate summary using Gemini
-        summarizer = GeminiSummarizer()
-        summary = summarizer.summarize_report(report_data)
-        
-        # Save summary
-        output_filename = generate_output_filename(original_filename)
-        output_path = os.path.join(str(OUTPUT_DIR), output_filename)
-        
-        summarizer.save_summary(summary, output_path)
+        loop = asyncio.get_running_loop()
+        status = await loop.run_in_executor(
+            worker_pool,
+            summarize_task,
+            pdf_source,
+            original_filename,
+            str(OUTPUT_DIR)
+        )
+        await task_store.set(task_id, status)
         
-        # Update task status
-        background_tasks_status[task_id] = {
-            "status": "completed",
-            "filename": original_filename,
-            "output_file": output_filename,
-            "output_path": output_path,
-            "model_used": summary.get("metadata", {}).get("model_used", "gemini-pro")
-        }
+        # Index the new summary now so the next listing does not have to
+        if status.get("status") == "completed":
+            await index_summary(status)
         
     except Exception as e:
-        background_tasks_status[task_id] = {
+        await task_store.set(task_id, {
             "status": "error",
             "filename": original_filename,
             "error": str(e)
-        }
+        })
+    
     finally:
-        # Clean up temp file
-        if os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
+        # The reference copy under the original name outlives the task's own file
+        if isinstance(pdf_source, str):
+            try:
+                await asyncio.to_thread(os.unlink, pdf_source)
+            except OSError:
+                pass
 
-def start_server(host="0.0.0.0", port=8000):
-    """Start the FastAPI server"""
-    uvicorn.run("src.api_server:app", host=host, port=port, reload=True)
+def start_server(host="0.0.0.0", port=8000, workers: Optional[int] = None):
+    """
+    Start the FastAPI server.
+    
+    Runs one worker process per CPU (at least two) when REDIS_URL is set. Task
+    status is process-local without Redis, so a single worker is used unless
+    WORKERS overrides it. Set RELOAD=1 for auto-reload during development.
+    """
+    if workers is None:
+        default_workers = max(2, os.cpu_count() or 1) if os.getenv("REDIS_URL") else 1
+        workers = int(os.getenv("WORKERS", default_workers))
+    reload = os.getenv("RELOAD") == "1"
+    
+    uvicorn.run(
+        "src.api_server:app",
+        host=host,
+        port=port,
+        workers=1 if reload else workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop does not support Windows
+        http="httptools",
+        reload=reload
+    )
 
 if __name__ == "__main__":
     # Start the server when run directly
@@ -1,10 +1,128 @@
 import os
+import re
 import json
+import asyncio
+import orjson
 import datetime
-from typing import Dict, List, Any, Optional
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Iterable, Tuple
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from src.prompt_templates import GEMINI_SCHEMA, PROMPT_VERSION
+from src.result_cache import text_hash, summary_cache_key, load_cached, store_cached
+from src.utils import atomic_write
+
+# JSON object inside a ``` or ```json code fence
+_JSON_BLOCK = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.S)
+_JSON_DECODER = json.JSONDecoder()
+
+def _extract_json(text: str) -> Dict[str, Any]:
+    """
+    Extract the JSON object from a model response, whether it is fenced in a
+    code block, surrounded by prose, or the whole response.
+    
+    Args:
+        text: Raw model response
+        
+    Returns:
+        Dict[str, Any]: Decoded JSON object
+        
+    Raises:
+        json.JSONDecodeError: If the response contains no decodable JSON object
+    """
+    # JSON mode responses are the bare object, so try that before scanning
+    try:
+        data = orjson.loads(text)
+        if isinstance(data, dict):
+            return data
+    except orjson.JSONDecodeError:
+        pass
+    
+    match = _JSON_BLOCK.search(text)
+    if match:
+        try:
+            return orjson.loads(match.group(1))
+        except json.JSONDecodeError:
+            pass
+    
+    # Decode in one pass from the first brace, ignoring anything after the object
+    start = text.find("{")
+    if start == -1:
+        raise json.JSONDecodeError("No JSON object found", text, 0)
+    return _JSON_DECODER.raw_decode(text, start)[0]
+
+def _decode_complete_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Decode the first JSON object in a partially streamed response.
+    
+    Args:
+        text: Response text received so far
+        
+    Returns:
+        Optional[Dict[str, Any]]: Decoded object, None if it is not complete yet
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    try:
+        return _JSON_DECODER.raw_decode(text, start)[0]
+    except json.JSONDecodeError:
+        return None
+
+def _format_sections(names: Iterable[str], contents: List[str]) -> str:
+    """Format report sections as a markdown block, empty if there are none"""
+    if not contents:
+        return ""
+    return "REPORT SECTIONS:\n" + "".join(
+        f"\n## {name}\n{content}\n" for name, content in zip(names, contents)
+    )
+
+def _format_numerical_data(numerical_data: List[Dict[str, Any]]) -> str:
+    """Format numerical data points as one line each"""
+    return "".join(
+        f"- {data_point['context']}: {data_point['value']} {data_point.get('unit', '')}\n"
+        for data_point in numerical_data
+    )
+
+def _format_titled_block(title: str, text: str) -> str:
+    """Prefix a block with its title, empty if the block is empty"""
+    return title + text if text else ""
+
+def _format_tables(tables: List[str]) -> str:
+    """Format tables as numbered blocks, empty if there are none"""
+    if not tables:
+        return ""
+    return "\nTABLES:\n" + "".join(
+        f"\nTable {i}:\n{table}\n" for i, table in enumerate(tables, 1)
+    )
+
+def _fit_to_budget(texts: List[str], budget: int) -> List[str]:
+    """
+    Truncate texts so their combined length fits a character budget. Texts
+    shorter than an even share are kept whole and their unused share is split
+    among the longer ones.
+    
+    Args:
+        texts: Texts to fit
+        budget: Maximum combined length
+        
+    Returns:
+        List[str]: The input list itself if it already fits, otherwise a new
+        list of truncated texts in the same order
+    """
+    if sum(map(len, texts)) <= budget:
+        return texts
+    
+    fitted = list(texts)
+    remaining = max(0, budget)
+    by_length = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for n, i in enumerate(by_length):
+        share = remaining // (len(texts) - n)
+        fitted[i] = texts[i][:share]
+        remaining -= len(fitted[i])
+    return fitted
+
 class GeminiSummarizer:
     def __init__(self):
         # Load environment variables
@@ -21,13 +139,16 @@ class GeminiSummarizer:
         self.model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-lite")
         self.max_tokens = int(os.getenv("MAX_TOKENS", "4096"))
         self.temperature = float(os.getenv("TEMPERATURE", "0.2"))
+        # Prompt size cap, about three times the output budget in tokens at ~4 chars per token
+        self.max_prompt_chars = int(os.getenv("MAX_PROMPT_CHARS", str(self.max_tokens * 3 * 4)))
         
-        # Initialize the model
+        # Initialize the model, asking for bare JSON rather than prose or a code fence
         self.model = genai.GenerativeModel(
             model_name=self.model_name,
             generation_config={
                 "max_output_tokens": self.max_tokens,
-                "temperature": self.temperature
+                "temperature": self.temperature,
+                "response_mime_type": "application/json"
             }
         )
     
@@ -47,130 +168,204 @@ class GeminiSummarizer:
         numerical_data = report_data.get("numerical_data", [])
         tables = report_data.get("tables", [])
         
-        # Create a structured prompt
-        prompt = f"""You are an expert data analyst for Satori XR, specializing in summarizing technical reports for visualization in XR environments. 
+        header = f"""You are an expert data analyst for Satori XR, specializing in summarizing technical reports for visualization in XR environments. 
 
 Analyze the following report and create a structured summary in VALID JSON format.
 
 REPORT TITLE: {title}
 
 """
+        numerical_text = _format_numerical_data(numerical_data)
         
-        # Add sections content
-        if sections:
-            prompt += "REPORT SECTIONS:\n"
-            for section_name, section_content in sections.items():
-                prompt += f"\n## {section_name}\n{section_content}\n"
+        # Truncate the report content so the whole prompt stays under max_prompt_chars
+        contents = [*sections.values(), *(str(table) for table in tables), numerical_text]
+        budget = self.max_prompt_chars - len(header) - len(GEMINI_SCHEMA)
+        fitted = _fit_to_budget(contents, budget)
+        if fitted is not contents:
+            print(f"Prompt content truncated from {sum(map(len, contents))} to {sum(map(len, fitted))} characters "
+                  f"to fit MAX_PROMPT_CHARS={self.max_prompt_chars}")
+            # Keep only whole numerical data lines
+            fitted[-1] = fitted[-1][:fitted[-1].rfind("\n") + 1]
         
-        # Add numerical data
-        if numerical_data:
-            prompt += "\nNUMERICAL DATA POINTS:\n"
-            for data_point in numerical_data:
-                prompt += f"- {data_point['context']}: {data_point['value']} {data_point.get('unit', '')}\n"
-        
-        # Add tables
-        if tables:
-            prompt += "\nTABLES:\n"
-            for i, table in enumerate(tables):
-                prompt += f"\nTable {i+1}:\n{table}\n"
+        return "".join((
+            header,
+            _format_sections(sections, fitted[:len(sections)]),
+            _format_titled_block("\nNUMERICAL DATA POINTS:\n", fitted[-1]),
+            _format_tables(fitted[len(sections):-1]),
+            GEMINI_SCHEMA
+        ))
+    
+    def summarize_report(self, report_data: Dict[str, Any], cache_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate a summary of the report using Gemini.
         
-        # Add output format instructions
-        prompt += """
-
-You are an expert automotive marketing analyst and 3D technical artist for Satori XR.
-Your task is to analyze a car brochure's text and map its key selling points to a specific list of parts from a 3D model.
-
-**CONTEXT:**
-1.  **Brochure Text:** The following is the full text extracted from a product brochure.
-    ---
-    {brochure_text}
-    ---
-
-2.  **3D Model Part Names:** The 3D model contains the following named parts. You MUST map features to one of these exact names.
-    ```json
-    {json.dumps(part_names, indent=2)}
-    ```
-
-**INSTRUCTIONS:**
-1.  Read the entire brochure text to understand the car's main features.
-2.  Identify up to 8 of the most compelling and marketable features described.
-3.  For each feature, determine which of the provided "3D Model Part Names" is the most logical anchor point for a hotspot.
-4.  For each feature, create a short, catchy `feature_title` and a compelling one-sentence `marketing_summary`.
-5.  You MUST respond with ONLY a valid JSON object. The root of the object must be a key named `hotspots` which contains a list of the feature objects you identified.
-6.  If a feature cannot be reasonably mapped to any part in the list, omit it from the output.
-
-**REQUIRED JSON OUTPUT FORMAT:**
-```json
-{{
-  "hotspots": [
-    {{
-      "feature_title": "Example: Panoramic Sunroof",
-      "marketing_summary": "Example: Enjoy breathtaking views and an open-air feeling with the expansive, edge-to-edge panoramic sunroof.",
-      "matched_part_name": "roof_panel"
-    }},
-    {{
-      "feature_title": "Example: Diamond-Cut Alloy Wheels",
-      "marketing_summary": "Example: The stylish 17-inch diamond-cut alloy wheels provide a premium and sporty stance on the road.",
-      "matched_part_name": "wheel_front_left"
-    }}
-  ]
-}}```
-
-Ensure your response is ONLY valid JSON without any additional text or explanation. Extract the most important information from the report, focusing on key metrics, trends, and insights that would be valuable in an XR visualization environment.
-"""
+        Args:
+            report_data: Processed report data from the PDF parser
+            cache_dir: Directory to cache summaries in, None to always call Gemini
+            
+        Returns:
+            Dict[str, Any]: Generated summary with metadata
+        """
+        prompt = self.create_summary_prompt(report_data)
+        cache_key, cached = self._load_cached_summary(report_data, prompt, cache_dir)
+        if cached is not None:
+            return cached
         
-        return prompt
+        summary = self._generate_summary(report_data, prompt)
+        self._store_cached_summary(cache_dir, cache_key, summary)
+        return summary
     
-    def summarize_report(self, report_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def summarize_report_async(self, report_data: Dict[str, Any], cache_dir: Optional[str] = None) -> Dict[str, Any]:
         """
-        Generate a summary of the report using Gemini.
+        Generate a summary of the report using Gemini without blocking the event loop.
         
         Args:
             report_data: Processed report data from the PDF parser
+            cache_dir: Directory to cache summaries in, as for summarize_report
             
         Returns:
             Dict[str, Any]: Generated summary with metadata
         """
-        # Create the prompt
         prompt = self.create_summary_prompt(report_data)
+        # Cache reads and writes are file I/O, so they run off the event loop
+        cache_key, cached = await asyncio.to_thread(self._load_cached_summary, report_data, prompt, cache_dir)
+        if cached is not None:
+            return cached
         
-        try:
-            # Call Gemini API
-            response = self.model.generate_content(prompt)
-            response_text = response.text
+        summary = await self._generate_summary_async(report_data, prompt)
+        await asyncio.to_thread(self._store_cached_summary, cache_dir, cache_key, summary)
+        return summary
+    
+    def _load_cached_summary(self, report_data: Dict[str, Any], prompt: str,
+                             cache_dir: Optional[str]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Look up the cached summary of a report. Summaries are keyed on the
+        prompt rather than the PDF bytes, so a re-exported PDF with the same
+        content still hits the cache.
+        
+        Args:
+            report_data: Processed report data from the PDF parser
+            prompt: Prompt the summary is generated from
+            cache_dir: Cache directory, None if caching is disabled
             
-            # Extract JSON from response
-            try:
-                # Try to parse the response as JSON
-                if "```json" in response_text:
-                    # Extract JSON from code block
-                    json_text = response_text.split("```json")[1].split("```")[0].strip()
-                    summary_data = json.loads(json_text)
-                else:
-                    # Try to parse the whole response as JSON
-                    summary_data = json.loads(response_text)
-                
-                # Add metadata
-                summary_data["metadata"] = {
-                    "source_file": report_data.get("filename", "Unknown"),
-                    "processing_timestamp": self._get_timestamp(),
-                    "model_used": self.model_name,
-                    "response_tokens": len(response_text.split()) # Approximate token count
-                }
-                
-                return summary_data
+        Returns:
+            Tuple[Optional[str], Optional[Dict[str, Any]]]: Cache key, None if
+                caching is disabled, and the cached summary if any
+        """
+        if cache_dir is None:
+            return None, None
+        
+        cache_key = summary_cache_key(text_hash(prompt), self.model_name, PROMPT_VERSION)
+        cached = load_cached(cache_dir, cache_key)
+        if cached is not None:
+            print(f"Using cached summary for {report_data.get('filename', 'Unknown')}")
+            cached["metadata"]["source_file"] = report_data.get("filename", "Unknown")
+        return cache_key, cached
+    
+    def _store_cached_summary(self, cache_dir: Optional[str], cache_key: Optional[str],
+                              summary: Dict[str, Any]) -> None:
+        """
+        Cache a generated summary. Fallback summaries carry an error and are never cached.
+        
+        Args:
+            cache_dir: Cache directory
+            cache_key: Cache key from _load_cached_summary, None if not cacheable
+            summary: Generated summary
+        """
+        if cache_key is not None and "error" not in summary.get("metadata", {}):
+            store_cached(cache_dir, cache_key, summary)
+    
+    def _generate_summary(self, report_data: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+        """
+        Call Gemini for a summary of the report.
+        
+        Args:
+            report_data: Processed report data from the PDF parser
+            prompt: Prompt built by create_summary_prompt
+            
+        Returns:
+            Dict[str, Any]: Generated summary with metadata
+        """
+        try:
+            # Call Gemini API, parsing as the response streams in
+            response = self.model.generate_content(prompt, stream=True)
+            chunks = []
+            summary_data = None
+            for chunk in response:
+                chunks.append(chunk.text)
+                if "}" in chunk.text:
+                    summary_data = _decode_complete_object("".join(chunks))
+                    if summary_data is not None:
+                        break
+            return self._parse_response(report_data, "".join(chunks), summary_data)
                 
-            except json.JSONDecodeError:
-                # If JSON parsing fails, create a fallback summary
-                print("Error parsing Gemini response as JSON. Creating fallback summary.")
-                fallback_summary = self._create_fallback_summary(report_data, response_text)
-                return fallback_summary
+        except Exception as e:
+            print(f"Error calling Gemini API: {e}")
+            fallback_summary = self._create_fallback_summary(report_data, str(e))
+            return fallback_summary
+    
+    async def _generate_summary_async(self, report_data: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+        """
+        Call Gemini for a summary of the report without blocking the event loop.
+        
+        Args:
+            report_data: Processed report data from the PDF parser
+            prompt: Prompt built by create_summary_prompt
+            
+        Returns:
+            Dict[str, Any]: Generated summary with metadata
+        """
+        try:
+            response = await self.model.generate_content_async(prompt, stream=True)
+            chunks = []
+            summary_data = None
+            async for chunk in response:
+                chunks.append(chunk.text)
+                if "}" in chunk.text:
+                    summary_data = _decode_complete_object("".join(chunks))
+                    if summary_data is not None:
+                        break
+            return self._parse_response(report_data, "".join(chunks), summary_data)
                 
         except Exception as e:
             print(f"Error calling Gemini API: {e}")
             fallback_summary = self._create_fallback_summary(report_data, str(e))
             return fallback_summary
     
+    def _parse_response(self, report_data: Dict[str, Any], response_text: str,
+                        summary_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Parse a Gemini response into a summary, falling back if it is not valid JSON.
+        
+        Args:
+            report_data: Processed report data from the PDF parser
+            response_text: Raw text of the Gemini response
+            summary_data: JSON object already decoded while streaming, if any
+            
+        Returns:
+            Dict[str, Any]: Generated summary with metadata
+        """
+        # Extract JSON from response
+        try:
+            if summary_data is None:
+                summary_data = _extract_json(response_text)
+            
+            # Add metadata
+            summary_data["metadata"] = {
+                "source_file": report_data.get("filename", "Unknown"),
+                "processing_timestamp": self._get_timestamp(),
+                "model_used": self.model_name,
+                "response_tokens": max(1, len(response_text) >> 2) # Approximate token count (~4 chars per token)
+            }
+            
+            return summary_data
+            
+        except json.JSONDecodeError:
+            # If JSON parsing fails, create a fallback summary
+            print("Error parsing Gemini response as JSON. Creating fallback summary.")
+            fallback_summary = self._create_fallback_summary(report_data, response_text)
+            return fallback_summary
+    
     def _create_fallback_summary(self, report_data: Dict[str, Any], error_message: str) -> Dict[str, Any]:
         """
         Create a basic fallback summary when the API call or JSON parsing fails.
@@ -226,34 +421,54 @@ Ensure your response is ONLY valid JSON without any additional text or explanati
         """
         return datetime.datetime.now().isoformat()
     
-    def batch_summarize(self, reports_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def batch_summarize(self, reports_data: List[Dict[str, Any]], max_concurrency: int = 8) -> List[Dict[str, Any]]:
         """
-        Generate summaries for multiple reports.
+        Generate summaries for multiple reports with concurrent Gemini requests.
         
         Args:
             reports_data: List of processed report data
+            max_concurrency: Maximum number of requests in flight, to respect rate limits
             
         Returns:
-            List[Dict[str, Any]]: List of generated summaries
+            List[Dict[str, Any]]: List of generated summaries, in input order
         """
-        summaries = []
-        for report_data in reports_data:
-            summary = self.summarize_report(report_data)
-            summaries.append(summary)
-        return summaries
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def summarize_one(report_data: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.summarize_report_async(report_data)
+        
+        return await asyncio.gather(*(summarize_one(report_data) for report_data in reports_data))
     
-    def save_summary(self, summary: Dict[str, Any], output_path: str) -> None:
+    def save_summary(self, summary: Dict[str, Any], output_path: str, pretty: bool = False) -> None:
         """
         Save the summary to a JSON file.
         
         Args:
             summary: Generated summary
             output_path: Path to save the summary
+            pretty: Indent the JSON for reading by hand instead of writing it compact
         """
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(summary, f, indent=2, ensure_ascii=False)
+        # Write metadata first so readers can stream it without parsing the rest
+        if "metadata" in summary:
+            summary = {"metadata": summary["metadata"], **summary}
+        
+        # Write through a temporary file so the API and req.py never see a partial summary
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        atomic_write(output_path, orjson.dumps(summary, option=option), durable=True)
         print(f"Summary saved to {output_path}")
 
+@lru_cache(maxsize=1)
+def get_summarizer() -> GeminiSummarizer:
+    """
+    Get the process-wide summarizer, creating it on first use so the
+    environment, API configuration and model are only set up once.
+    
+    Returns:
+        GeminiSummarizer: Shared summarizer instance
+    """
+    return GeminiSummarizer()
+
 # For testing
 if __name__ == "__main__":
     # Sample data for testing
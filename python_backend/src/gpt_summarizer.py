@@ -1,9 +1,13 @@
 import os
 import json
+import orjson
 from typing import Dict, List, Optional, Any
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from src.prompt_templates import GPT_SCHEMA
+from src.utils import atomic_write
+
 # Load environment variables
 load_dotenv()
 
@@ -37,81 +41,32 @@ class GPTSummarizer:
         sections = report_data.get('sections', {})
         numerical_data = report_data.get('numerical_data', [])
         
-        prompt = f"""
+        parts = [f"""
 You are an AI assistant specialized in analyzing factory and operations reports. 
 Analyze the following report and create a structured summary optimized for XR dashboard visualization.
 
 SOURCE: {report_data.get('source_file', 'Unknown')}
 
 REPORT CONTENT:
-"""
+"""]
         
         # Add sections to prompt
-        for section_name, content in sections.items():
-            prompt += f"\n\n{section_name.upper().replace('_', ' ')}:\n{content[:1000]}..."
+        parts.append("".join(
+            f"\n\n{section_name.upper().replace('_', ' ')}:\n{content[:1000]}..."
+            for section_name, content in sections.items()
+        ))
         
         # Add numerical data context
         if numerical_data:
-            prompt += "\n\nKEY METRICS FOUND:\n"
-            for data in numerical_data[:10]:  # Limit to first 10 metrics
-                prompt += f"- {data.get('context', 'N/A')}\n"
+            parts.append("\n\nKEY METRICS FOUND:\n")
+            parts.append("".join(
+                f"- {data.get('context', 'N/A')}\n"
+                for data in numerical_data[:10]  # Limit to first 10 metrics
+            ))
         
-        prompt += """
-
-Please provide a JSON response with the following structure:
-{
-  "executive_summary": "Brief 2-3 sentence overview of the report",
-  "key_insights": [
-    "Insight 1",
-    "Insight 2",
-    "Insight 3"
-  ],
-  "daily_output": {
-    "total_production": "Number with unit",
-    "efficiency_rate": "Percentage",
-    "status": "Normal/Warning/Critical"
-  },
-  "anomalies": [
-    {
-      "type": "Equipment/Process/Quality",
-      "description": "Brief description",
-      "severity": "Low/Medium/High",
-      "impact": "Brief impact description"
-    }
-  ],
-  "events": [
-    {
-      "time": "Time if available",
-      "event": "Event description",
-      "category": "Maintenance/Production/Safety/Other"
-    }
-  ],
-  "recommendations": [
-    {
-      "priority": "High/Medium/Low",
-      "action": "Recommended action",
-      "timeline": "Suggested timeline"
-    }
-  ],
-  "metrics": {
-    "production_volume": "Number with unit",
-    "quality_score": "Percentage or score",
-    "downtime": "Time duration",
-    "energy_consumption": "Number with unit"
-  },
-  "dashboard_alerts": [
-    {
-      "level": "Info/Warning/Critical",
-      "message": "Alert message for XR display",
-      "action_required": true/false
-    }
-  ]
-}
-
-Ensure all numerical values include appropriate units. If specific data is not available, use "N/A" or reasonable estimates based on context.
-"""
+        parts.append(GPT_SCHEMA)
         
-        return prompt
+        return "".join(parts)
     
     def summarize_report(self, report_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -146,7 +101,7 @@ Ensure all numerical values include appropriate units. If specific data is not a
             
             # Parse the JSON response
             summary_text = response.choices[0].message.content
-            summary = json.loads(summary_text)
+            summary = orjson.loads(summary_text)
             
             # Add metadata
             summary['metadata'] = {
@@ -250,13 +205,14 @@ Ensure all numerical values include appropriate units. If specific data is not a
         
         return summaries
     
-    def save_summary(self, summary: Dict[str, Any], output_path: str) -> bool:
+    def save_summary(self, summary: Dict[str, Any], output_path: str, pretty: bool = False) -> bool:
         """
         Saves summary to JSON file.
         
         Args:
             summary (Dict[str, Any]): Summary data
             output_path (str): Path to save the summary
+            pretty (bool): Indent the JSON for reading by hand instead of writing it compact
             
         Returns:
             bool: True if successful, False otherwise
@@ -264,8 +220,12 @@ Ensure all numerical values include appropriate units. If specific data is not a
         try:
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, indent=2, ensure_ascii=False)
+            # Write metadata first so readers can stream it without parsing the rest
+            if 'metadata' in summary:
+                summary = {'metadata': summary['metadata'], **summary}
+            
+            option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+            atomic_write(output_path, orjson.dumps(summary, option=option), durable=True)
             
             print(f"Summary saved to: {output_path}")
             return True
@@ -1,32 +1,34 @@
 import os
 import sys
 import json
+import asyncio
 import logging
 import concurrent.futures
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator
+from tqdm import tqdm
 
 # Add the parent directory to sys.path to allow imports from src
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Configure basic logging for main.py to include thread information
+# Configure basic logging for main.py to include process information
 logging.basicConfig(
     level=logging.INFO, 
-    format='%(asctime)s - %(threadName)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s',
+    format='%(asctime)s - %(processName)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s',
     handlers=[
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
-from src.pdf_parser import process_pdf_report
-from src.gemini_summarizer import GeminiSummarizer
+from src.pdf_parser import process_pdf_report, init_worker
+from src.gemini_summarizer import GeminiSummarizer, get_summarizer
+from src.result_cache import get_cache_dir, get_semantic_cache
 from src.utils import (
-    find_pdf_files, 
+    iter_pdf_files, 
     ensure_directory_exists, 
     generate_output_filename,
-    print_processing_stats,
-    ProgressTracker
+    print_processing_stats
 )
 
 # Define paths
@@ -34,13 +36,98 @@ BASE_DIR = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 INPUT_DIR = BASE_DIR / "data" / "input_pdfs"
 OUTPUT_DIR = BASE_DIR / "data" / "output_summaries"
 
-def process_single_pdf(pdf_path: str, output_dir: str = None) -> Dict[str, Any]:
+def parse_pdf(pdf_path: str, output_dir: str, page_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Extract text and structure from a PDF. Runs in a worker process during
+    batch processing, so it must stay a picklable top-level function.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        output_dir (str): Directory the summary will be saved to
+        page_workers (Optional[int]): Processes to extract the pages of a long
+            PDF with, None to extract them in this process
+        
+    Returns:
+        Dict[str, Any]: Processed report data
+    """
+    print(f"\nProcessing PDF: {pdf_path}")
+    return process_pdf_report(pdf_path, cache_dir=get_cache_dir(output_dir), page_workers=page_workers)
+
+def reuse_similar_summary(report_data: Dict[str, Any], output_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up the summary of a near-identical earlier report, if semantic caching is enabled.
+    
+    Args:
+        report_data (Dict[str, Any]): Processed report data
+        output_dir (str): Directory to save the summary
+        
+    Returns:
+        Optional[Dict[str, Any]]: Reusable summary, None if there is none
+    """
+    semantic_cache = get_semantic_cache(output_dir)
+    if semantic_cache is None:
+        return None
+    
+    summary = semantic_cache.lookup(report_data)
+    if summary is not None:
+        print("Reusing the summary of a near-identical report")
+        summary["metadata"]["source_file"] = report_data.get("filename", "Unknown")
+    return summary
+
+def remember_summary(report_data: Dict[str, Any], summary: Dict[str, Any], output_dir: str) -> None:
+    """
+    Add a new summary to the semantic cache, if it is enabled.
+    
+    Args:
+        report_data (Dict[str, Any]): Processed report data
+        summary (Dict[str, Any]): Its summary
+        output_dir (str): Directory to save the summary
+    """
+    semantic_cache = get_semantic_cache(output_dir)
+    if semantic_cache is not None and "error" not in summary.get("metadata", {}):
+        semantic_cache.store(report_data, summary)
+
+def save_summary_result(summarizer: GeminiSummarizer, summary: Dict[str, Any], report_data: Dict[str, Any],
+                        pdf_path: str, output_dir: str, tokens_used: int) -> Dict[str, Any]:
+    """
+    Save a summary to the output directory.
+    
+    Args:
+        summarizer (GeminiSummarizer): Summarizer that produced the summary
+        summary (Dict[str, Any]): Generated summary
+        report_data (Dict[str, Any]): Processed report data
+        pdf_path (str): Path to the PDF file
+        output_dir (str): Directory to save the summary
+        tokens_used (int): Tokens spent on the summary
+        
+    Returns:
+        Dict[str, Any]: Processing result
+    """
+    output_filename = generate_output_filename(os.path.basename(pdf_path))
+    output_path = os.path.join(output_dir, output_filename)
+    
+    summarizer.save_summary(summary, output_path)
+    
+    return {
+        "success": True,
+        "source_file": os.path.basename(pdf_path),
+        "output_file": output_filename,
+        "output_path": output_path,
+        "sections_found": list(report_data.get("sections", {}).keys()),
+        "numerical_data_points": len(report_data.get("numerical_data", [])),
+        "tokens_used": tokens_used
+    }
+
+def process_single_pdf(pdf_path: str, output_dir: str = None,
+                       summarizer: Optional[GeminiSummarizer] = None) -> Dict[str, Any]:
     """
     Process a single PDF file and generate a summary.
     
     Args:
         pdf_path (str): Path to the PDF file
         output_dir (str): Directory to save the summary
+        summarizer (Optional[GeminiSummarizer]): Summarizer to use, defaults to
+            the process-wide one so repeated calls share its configuration
         
     Returns:
         Dict[str, Any]: Processing result
@@ -51,46 +138,126 @@ def process_single_pdf(pdf_path: str, output_dir: str = None) -> Dict[str, Any]:
     ensure_directory_exists(output_dir)
     
     try:
-        # Extract text and structure from PDF
-        print(f"\nProcessing PDF: {pdf_path}")
-        report_data = process_pdf_report(pdf_path)
+        # Extract text and structure from PDF, using every core for a long one
+        report_data = parse_pdf(pdf_path, output_dir, page_workers=os.cpu_count())
         
         if "error" in report_data:
             print(f"Error processing PDF: {report_data['error']}")
             return {"success": False, "error": report_data["error"]}
         
-        # Generate summary using Gemini
-        print("Generating summary using Gemini...")
-        summarizer = GeminiSummarizer()
-        summary = summarizer.summarize_report(report_data)
-        
-        # Save summary to file
-        output_filename = generate_output_filename(os.path.basename(pdf_path))
-        output_path = os.path.join(output_dir, output_filename)
+        if summarizer is None:
+            summarizer = get_summarizer()
+        summary = reuse_similar_summary(report_data, output_dir)
+        tokens_used = 0
         
-        summarizer.save_summary(summary, output_path)
+        if summary is None:
+            # Generate summary using Gemini
+            print("Generating summary using Gemini...")
+            summary = summarizer.summarize_report(report_data, get_cache_dir(output_dir))
+            tokens_used = summary.get("metadata", {}).get("response_tokens", 0)
+            remember_summary(report_data, summary, output_dir)
         
-        return {
-            "success": True,
-            "source_file": os.path.basename(pdf_path),
-            "output_file": output_filename,
-            "output_path": output_path,
-            "sections_found": list(report_data.get("sections", {}).keys()),
-            "numerical_data_points": len(report_data.get("numerical_data", [])),
-            "tokens_used": summary.get("metadata", {}).get("response_tokens", 0)
-        }
+        return save_summary_result(summarizer, summary, report_data, pdf_path, output_dir, tokens_used)
         
     except Exception as e:
         print(f"Error processing {pdf_path}: {e}")
         return {"success": False, "error": str(e)}
 
-def batch_process_directory(input_dir: str = None, output_dir: str = None) -> Dict[str, Any]:
+async def summarize_and_save(summarizer: GeminiSummarizer, report_data: Dict[str, Any], pdf_path: str,
+                             output_dir: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """
+    Summarize a parsed report without blocking the event loop and save the summary.
+    
+    Args:
+        summarizer (GeminiSummarizer): Summarizer shared by the batch
+        report_data (Dict[str, Any]): Processed report data
+        pdf_path (str): Path to the PDF file
+        output_dir (str): Directory to save the summary
+        semaphore (asyncio.Semaphore): Bounds the Gemini requests in flight
+        
+    Returns:
+        Dict[str, Any]: Processing result
+    """
+    # Semantic cache scans and file writes block, so they run in threads and
+    # the Gemini requests in flight keep streaming meanwhile
+    summary = await asyncio.to_thread(reuse_similar_summary, report_data, output_dir)
+    tokens_used = 0
+    
+    if summary is None:
+        async with semaphore:
+            summary = await summarizer.summarize_report_async(report_data, get_cache_dir(output_dir))
+        tokens_used = summary.get("metadata", {}).get("response_tokens", 0)
+        await asyncio.to_thread(remember_summary, report_data, summary, output_dir)
+    
+    return await asyncio.to_thread(save_summary_result, summarizer, summary, report_data, pdf_path, output_dir, tokens_used)
+
+async def process_batch(pdf_files: Iterator[str], output_dir: str, max_workers: int,
+                        max_concurrency: int) -> List[Dict[str, Any]]:
+    """
+    Parse PDFs in worker processes as they are discovered and summarize each one
+    as soon as it is parsed, with up to max_concurrency Gemini requests in flight.
+    
+    Args:
+        pdf_files (Iterator[str]): Paths to the PDF files, possibly still being discovered
+        output_dir (str): Directory to save summaries
+        max_workers (int): Number of parsing processes
+        max_concurrency (int): Maximum number of concurrent Gemini requests
+        
+    Returns:
+        List[Dict[str, Any]]: Processing results, in discovery order
+    """
+    loop = asyncio.get_running_loop()
+    summarizer = get_summarizer()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # Enough PDFs in flight to keep every worker and Gemini slot busy, without
+    # discovery running arbitrarily far ahead of processing
+    in_flight = asyncio.Semaphore(2 * max_workers + max_concurrency)
+    
+    async def process_one(pdf_path: str) -> Dict[str, Any]:
+        try:
+            report_data = await loop.run_in_executor(executor, parse_pdf, pdf_path, output_dir)
+            if "error" in report_data:
+                result = {"success": False, "error": report_data["error"]}
+            else:
+                result = await summarize_and_save(summarizer, report_data, pdf_path, output_dir, semaphore)
+        except Exception as exc:
+            result = {"success": False, "error": str(exc)}
+        finally:
+            in_flight.release()
+        result.setdefault("source_file", os.path.basename(pdf_path))
+        # tqdm only redraws every mininterval, however fast PDFs complete
+        progress.update()
+        return result
+    
+    # PDF parsing is CPU bound, so it runs in its own processes to get around
+    # the GIL, while the Gemini calls are network bound and overlap on the loop.
+    # The workers live for the whole batch, so each parses many PDFs with warm
+    # PyMuPDF caches
+    tasks = []
+    with tqdm(total=0, desc="Processing PDFs", unit="pdf") as progress, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker) as executor:
+        while True:
+            await in_flight.acquire()
+            # Directory scanning blocks, so it runs in a thread between submissions
+            pdf_path = await asyncio.to_thread(next, pdf_files, None)
+            if pdf_path is None:
+                in_flight.release()
+                break
+            progress.total += 1
+            tasks.append(asyncio.create_task(process_one(pdf_path)))
+        return await asyncio.gather(*tasks)
+
+def batch_process_directory(input_dir: str = None, output_dir: str = None, max_workers: int = None,
+                            max_concurrency: int = 8, recursive: bool = False) -> Dict[str, Any]:
     """
     Process all PDF files in a directory.
     
     Args:
         input_dir (str): Directory containing PDF files
         output_dir (str): Directory to save summaries
+        max_workers (int): Number of worker processes, defaults to the CPU count capped at 4
+        max_concurrency (int): Maximum number of concurrent Gemini requests
+        recursive (bool): Also process PDFs in subdirectories
         
     Returns:
         Dict[str, Any]: Processing statistics
@@ -101,61 +268,45 @@ def batch_process_directory(input_dir: str = None, output_dir: str = None) -> Di
     if output_dir is None:
         output_dir = str(OUTPUT_DIR)
     
+    if max_workers is None:
+        # PyMuPDF parsing is CPU bound, more workers than this oversubscribe a typical machine
+        max_workers = min(os.cpu_count() or 1, 4)
+    
     ensure_directory_exists(input_dir)
     ensure_directory_exists(output_dir)
     
-    # Find all PDF files
-    pdf_files = find_pdf_files(input_dir)
+    # PDF files are processed as they are found rather than after the whole scan
+    pdf_files = iter_pdf_files(input_dir, recursive)
     
-    if not pdf_files:
+    try:
+        results = asyncio.run(process_batch(pdf_files, output_dir, max_workers, max_concurrency))
+    except Exception as e:
+        print(f"Error processing batch: {e}")
+        return {"success": False, "error": str(e)}
+    
+    if not results:
         print(f"No PDF files found in {input_dir}")
         return {"success": False, "error": "No PDF files found"}
     
-    print(f"Found {len(pdf_files)} PDF files to process")
-    
-    # Process each PDF
-    results = []
     success_count = 0
     error_count = 0
     total_tokens = 0
     
-    progress = ProgressTracker(len(pdf_files), "Processing PDFs")
-
-    # Use ThreadPoolExecutor for concurrent processing
-    # The process_single_pdf function is I/O bound (file reading, API calls),
-    # so threads are appropriate.
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        # Submit all PDF processing tasks to the executor
-        future_to_pdf = {executor.submit(process_single_pdf, pdf_file, output_dir): pdf_file for pdf_file in pdf_files}
-        
-        for future in concurrent.futures.as_completed(future_to_pdf):
-            pdf_file_path = future_to_pdf[future]
-            try:
-                result = future.result() # Get the result from the completed future
-                results.append(result)
-                
-                if result.get("success", False):
-                    success_count += 1
-                    total_tokens += result.get("tokens_used", 0)
-                    logger.info(f"Successfully processed and summarized: {os.path.basename(pdf_file_path)}")
-                else:
-                    error_count += 1
-                    logger.error(f"Failed to process {os.path.basename(pdf_file_path)}: {result.get('error', 'Unknown error')}")
-            except Exception as exc:
-                error_count += 1
-                logger.error(f"{os.path.basename(pdf_file_path)} generated an exception: {exc}")
-                results.append({"success": False, "error": str(exc), "source_file": os.path.basename(pdf_file_path)})
-            finally:
-                progress.update()
-    
-    # progress.finalize() # This was causing an AttributeError, progress bar completes automatically
+    for result in results:
+        if result.get("success", False):
+            success_count += 1
+            total_tokens += result.get("tokens_used", 0)
+            logger.info(f"Successfully processed and summarized: {result['source_file']}")
+        else:
+            error_count += 1
+            logger.error(f"Failed to process {result['source_file']}: {result.get('error', 'Unknown error')}")
     
     # Compile statistics
     stats = {
-        "total_files": len(pdf_files),
+        "total_files": len(results),
         "success_count": success_count,
         "error_count": error_count,
-        "success_rate": f"{(success_count / len(pdf_files) * 100):.1f}%" if pdf_files else "N/A",
+        "success_rate": f"{(success_count / len(results) * 100):.1f}%",
         "total_tokens_used": total_tokens,
         "output_directory": output_dir
     }
@@ -173,6 +324,9 @@ def main():
     parser.add_argument("--input", "-i", help="Input PDF file or directory")
     parser.add_argument("--output", "-o", help="Output directory for summaries")
     parser.add_argument("--batch", "-b", action="store_true", help="Process all PDFs in input directory")
+    parser.add_argument("--workers", "-w", type=int, help="Number of worker processes for batch mode")
+    parser.add_argument("--concurrency", "-c", type=int, default=8, help="Maximum concurrent Gemini requests in batch mode")
+    parser.add_argument("--recursive", "-r", action="store_true", help="Also process PDFs in subdirectories in batch mode")
     
     args = parser.parse_args()
     
@@ -182,7 +336,7 @@ def main():
         output_dir = args.output if args.output else str(OUTPUT_DIR)
         
         print(f"Batch processing PDFs from {input_dir}")
-        batch_process_directory(input_dir, output_dir)
+        batch_process_directory(input_dir, output_dir, args.workers, args.concurrency, args.recursive)
         
     elif args.input and os.path.isfile(args.input):
         # Single file processing mode
@@ -3,8 +3,24 @@ import re
 import os
 import datetime
 import logging
-import pdfplumber
-from typing import Dict, List, Optional, Any, Tuple
+import bisect
+import copy
+from collections import OrderedDict
+import math
+import concurrent.futures
+from typing import Dict, List, Optional, Any, Tuple, Union, Iterator, Iterable, Callable
+
+try:
+    import hyperscan
+except ImportError:  # Optional, extract_numerical_data falls back to RE2 or re
+    hyperscan = None
+
+try:
+    import re2
+except ImportError:  # Optional, extract_numerical_data falls back to re alone
+    re2 = None
+
+from src.result_cache import content_hash, load_cached, store_cached
 
 # Configure logging
 logging.basicConfig(
@@ -14,115 +30,504 @@ logging.basicConfig(
 )
 logger = logging.getLogger('pdf_parser')
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+# Set PDF_PARSER_DEBUG_DUMPS=1 to save the raw, merged and cleaned text of each
+# PDF under data/processed_plaintext for debugging
+DEBUG_DUMPS = os.getenv("PDF_PARSER_DEBUG_DUMPS") == "1"
+
+# Debug dumps are encoded and written this many characters at a time
+_DUMP_CHUNK_SIZE = 1 << 20
+
+# Regex patterns, compiled once at import instead of on every call
+_RE_TABLE = re.compile(r'(--- TABLE START ---[\s\S]*?--- TABLE END ---)')
+_RE_PAGE = re.compile(r'--- Page (\d+) ---')
+_RE_TITLE = re.compile(r'^([^\n]+)')
+
+# Common section headings for factory/operations reports
+_SECTION_HEADINGS = {
+    "executive_summary": r"executive summary|summary|overview",
+    "daily_output": r"daily output|production|output",
+    "anomalies": r"anomalies|issues|problems|alerts",
+    "events": r"events|incidents|activities",
+    "recommendations": r"recommendations|actions|next steps",
+    "metrics": r"metrics|kpis?|performance|statistics"
+}
+
+# Any section heading on a line of its own, optionally ending in a colon, with
+# the section name as the group name, so a single scan finds every heading.
+# Text after the colon is not allowed, as key/value lines like "Output: 1200
+# units" would otherwise start sections
+_RE_SECTION_HEADING = re.compile(
+    r"^[^\S\n]*(?:" + "|".join(f"(?P<{name}>{heading})" for name, heading in _SECTION_HEADINGS.items()) + r")[^\S\n]*:?[^\S\n]*$",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Documents with fewer pages are always extracted in-process, since starting
+# worker processes would cost more than it saves
+_MIN_PARALLEL_PAGES = 8
+
+# With stop_at_sections, key sections are looked for in the front matter
+# first, and the rest of the report is only read if too few turn up there
+_SECTION_SEARCH_PAGES = 15
+_MIN_SECTIONS_FOUND = 3
+
+# A section ends at the next paragraph that starts a heading-like line
+_RE_SECTION_END = re.compile(r"\n\n[A-Z][^\n]*:?\s*\n", re.IGNORECASE)
+_RE_WHITESPACE = re.compile(r"\s*")
+
+# Numbers with units or context, as one alternation so the text is scanned once.
+# Each branch names its own groups and lastgroup tells which one matched
+_RE_NUMBER = re.compile(
+    r'(?P<value1>\d+(?:\.\d+)?)\s*(?P<unit1>units?|pieces?|items?|kg|tons?|hours?|minutes?|%|percent)'
+    r'|(?P<value2>\d+(?:\.\d+)?)\s*(?P<unit2>efficiency|productivity|output|production)'
+    r'|(?:temperature|pressure|speed|rate)\s*:?\s*(?P<value3>\d+(?:\.\d+)?)\s*(?P<unit3>°[CF]|psi|rpm|%)?',
+    re.IGNORECASE
+)
+
+# Hyperscan and RE2 differ from re in what \d, \s and case-insensitive letters
+# match: their Unicode tables are of other versions, their \s leaves out
+# \x1c-\x1f, and re also folds a few letters outside ASCII (dotted and
+# dotless i, the Kelvin sign, long s). So _RE_NUMBER is ported to them with
+# re's sets spelled out. The pattern has no character classes containing
+# these letters
+_PORTABLE_LETTERS = {"i": "[iI\u0130\u0131]", "k": "[kK\u212a]", "s": "[sS\u017f]"}
+_RE_PORTABLE_TOKEN = re.compile(r"\(\?P<\w+>|\\.|[iks]", re.IGNORECASE)
+
+# No decimal digit or whitespace character lies above this code point
+_MAX_CLASS_CODE_POINT = 0x1FFFF
+
+def _char_class(predicate: Callable[[str], bool]) -> str:
+    """
+    Character class of every code point up to _MAX_CLASS_CODE_POINT that
+    predicate accepts, in the \\x{...} syntax Hyperscan and RE2 share.
+    """
+    ranges = []
+    for code in range(_MAX_CLASS_CODE_POINT + 1):
+        if predicate(chr(code)):
+            if ranges and ranges[-1][1] == code - 1:
+                ranges[-1][1] = code
+            else:
+                ranges.append([code, code])
+    return "[" + "".join(
+        f"\\x{{{start:x}}}" if start == end else f"\\x{{{start:x}}}-\\x{{{end:x}}}" for start, end in ranges
+    ) + "]"
+
+def _portable_number_pattern() -> str:
+    """_RE_NUMBER's pattern with re's Unicode classes and case folding spelled out"""
+    # re's \d is str.isdecimal and its \s is str.isspace
+    replacements = {r"\d": _char_class(str.isdecimal), r"\s": _char_class(str.isspace), **_PORTABLE_LETTERS}
+    def port_token(match: re.Match) -> str:
+        token = match.group(0)
+        return replacements.get(token if len(token) > 1 else token.lower(), token)
+    return _RE_PORTABLE_TOKEN.sub(port_token, _RE_NUMBER.pattern)
+
+def _compile_number_database() -> Optional["hyperscan.Database"]:
+    """
+    Compile the Hyperscan database for extract_numerical_data, if Hyperscan is
+    installed. Hyperscan finds where matches end in one SIMD pass but cannot
+    capture groups, so the groups are dropped and re then confirms each match
+    """
+    if hyperscan is None:
+        return None
+    expression = re.sub(r"\(\?P<\w+>", "(?:", _portable_number_pattern())
+    flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+    database = hyperscan.Database()
+    database.compile(expressions=[expression.encode("utf-8")], ids=[0], elements=1, flags=[flags])
+    return database
+
+_NUMBER_DATABASE = _compile_number_database()
+
+def _compile_number_re2() -> Optional["re2._Regexp"]:
+    """
+    Compile _RE_NUMBER with RE2 for extract_numerical_data, if RE2 is
+    installed. Without Hyperscan, RE2 scans for it about 1.5 times as fast as re
+    """
+    if re2 is None:
+        return None
+    return re2.compile("(?i)" + _portable_number_pattern())
+
+_RE2_NUMBER = _compile_number_re2()
+
+# Plain text extraction flags: keep whitespace for the cleaning pass, clip to
+# the page and expand ligatures so the regexes above see plain letters
+_TEXT_FLAGS = fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+
+# PDFs up to this size are read into memory once and shared by every stage
+_MAX_SHARED_PDF_SIZE = 256 * 1024 * 1024
+
+# A PDF is given either as a path on disk or as its raw bytes already in memory
+PdfSource = Union[str, bytes]
+
+# Results of the most recently processed PDF files, so a long-running process
+# that sees an unchanged file again (retries, duplicates in a batch) skips the
+# whole pipeline. Keyed by path, mtime, size and stop_at_sections
+_RESULT_MEMO: "OrderedDict[Tuple[str, int, int, bool], Dict[str, Any]]" = OrderedDict()
+_RESULT_MEMO_SIZE = 16
+
+def _memo_key(pdf_source: PdfSource, stop_at_sections: bool) -> Optional[Tuple[str, int, int, bool]]:
+    """Key of a PDF file in _RESULT_MEMO, None for bytes and files that cannot be stat'ed"""
+    if isinstance(pdf_source, bytes):
+        return None
+    try:
+        stat = os.stat(pdf_source)
+    except OSError:
+        return None
+    return (os.path.abspath(pdf_source), stat.st_mtime_ns, stat.st_size, stop_at_sections)
+
+def _describe_source(pdf_source: PdfSource) -> str:
+    """Short name of a PDF source for log messages"""
+    if isinstance(pdf_source, bytes):
+        return f"<in-memory PDF, {len(pdf_source)} bytes>"
+    return os.path.basename(pdf_source)
+
+def _source_missing(pdf_source: PdfSource) -> bool:
+    """True if the PDF source is a path that does not exist"""
+    return not isinstance(pdf_source, bytes) and not os.path.exists(pdf_source)
+
+def _read_pdf_once(pdf_source: PdfSource) -> PdfSource:
     """
-    Extracts raw text content from all pages of a PDF file.
+    Reads a PDF path into memory so later stages share one buffer instead of
+    each opening and reading the file. Missing files and files larger than
+    _MAX_SHARED_PDF_SIZE are left as paths.
     
     Args:
-        pdf_path (str): Path to the PDF file
+        pdf_source (PdfSource): Path to the PDF file, or its raw bytes
         
     Returns:
-        str: Extracted text content from all pages
+        PdfSource: Raw bytes of the PDF, or the path unchanged
+    """
+    if isinstance(pdf_source, bytes):
+        return pdf_source
+    try:
+        with open(pdf_source, "rb") as f:
+            if os.fstat(f.fileno()).st_size > _MAX_SHARED_PDF_SIZE:
+                return pdf_source
+            return f.read()
+    except OSError:
+        return pdf_source
+
+def _open_fitz(pdf_source: PdfSource) -> fitz.Document:
+    """Open a PDF source with PyMuPDF"""
+    if isinstance(pdf_source, bytes):
+        return fitz.open(stream=pdf_source, filetype="pdf")
+    return fitz.open(pdf_source)
+
+def init_worker() -> None:
+    """
+    Prepares a long-lived worker process for parsing many PDFs. Extracting a
+    throwaway page loads MuPDF's built-in fonts into its resource store, which
+    lives as long as the process, so later documents find them already decoded.
+    """
+    with fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_text((72, 72), "Warm up")
+        page.get_text("text", flags=_TEXT_FLAGS)
+
+def _format_table(table: List[List[Any]]) -> str:
+    """Format the cells of a table as padded rows between table markers"""
+    # Calculate column widths for better formatting in one pass over the cells
+    col_widths = [0] * max(map(len, table))
+    for row in table:
+        for i, cell in enumerate(row):
+            width = len(str(cell))
+            if width > col_widths[i]:
+                col_widths[i] = width
+    # Two spaces between columns
+    col_widths = [width + 2 for width in col_widths]
+    
+    # Format the table as a string, one padded row per line
+    lines = ["\n--- TABLE START ---\n"]
+    for row in table:
+        lines.append("".join([(str(cell).strip() if cell else "").ljust(width) for cell, width in zip(row, col_widths)]))
+        lines.append("\n")
+    lines.append("--- TABLE END ---\n")
+    return "".join(lines)
+
+def _extract_page_tables(page: fitz.Page, page_num: int) -> List[Dict[str, Any]]:
+    """Detect and format the tables on one page. A failure only loses this page's tables, never its text"""
+    try:
+        found_tables = page.find_tables().tables
+    except Exception as e:
+        logger.error(f"Error extracting tables from page {page_num}: {str(e)}")
+        return []
+    
+    if found_tables:
+        logger.info(f"Found {len(found_tables)} tables on page {page_num}")
+    
+    debug = logger.isEnabledFor(logging.DEBUG)
+    page_tables = []
+    for table_num, found_table in enumerate(found_tables, start=1):
+        table = found_table.extract()
+        if table and len(table) > 0:
+            # Table position on page as (x0, top, x1, bottom)
+            table_bbox = tuple(found_table.bbox)
+            if debug:
+                logger.debug(f"Table {table_num} position: {table_bbox}")
+            
+            page_tables.append({
+                "page_num": page_num,
+                "table_num": table_num,
+                "content": _format_table(table),
+                "position": table_bbox
+            })
+            
+            if debug:
+                logger.debug(f"Extracted table {table_num} from page {page_num} with {len(table)} rows")
+    return page_tables
+
+def _extract_page_range(pdf_path: PdfSource, start: int, end: int,
+                        with_tables: bool) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Extract pages start to end - 1 in a worker process, which opens its own document"""
+    page_texts, tables = [], []
+    with _open_fitz(pdf_path) as doc:
+        for page_index in range(start, end):
+            page = doc[page_index]
+            page_texts.append(page.get_text("text", flags=_TEXT_FLAGS))
+            if with_tables:
+                tables.extend(_extract_page_tables(page, page_index + 1))
+    return page_texts, tables
+
+def _extract_pages_in_parallel(pdf_path: PdfSource, start_page: int, page_count: int, workers: int,
+                               with_tables: bool) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Split pages start_page to page_count - 1 into one contiguous range per worker and extract them concurrently"""
+    chunk_size = math.ceil((page_count - start_page) / workers)
+    starts = range(start_page, page_count, chunk_size)
+    ends = [min(start + chunk_size, page_count) for start in starts]
+    page_texts, tables = [], []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=len(starts)) as executor:
+        for chunk_texts, chunk_tables in executor.map(_extract_page_range, [pdf_path] * len(starts),
+                                                      starts, ends, [with_tables] * len(starts)):
+            page_texts.extend(chunk_texts)
+            tables.extend(chunk_tables)
+    return page_texts, tables
+
+def _extract_pages(pdf_path: PdfSource, stop_at_sections: bool, max_pages: Optional[int],
+                   workers: Optional[int], with_tables: bool, start_page: int = 0,
+                   found_sections: Iterable[str] = (),
+                   worker_path: Optional[str] = None) -> Tuple[List[str], List[Dict[str, Any]]]:
     """
-    logger.info(f"Extracting text from PDF: {os.path.basename(pdf_path)}")
+    Extract the text and optionally the tables of each page in one pass over
+    the document, from the page at index start_page on. With stop_at_sections,
+    headings in found_sections were already seen on earlier pages. Worker
+    processes open worker_path if given rather than receive pdf_path's bytes.
+    """
+    logger.info(f"Extracting text{' and tables' if with_tables else ''} from PDF: {_describe_source(pdf_path)}")
     
-    if not os.path.exists(pdf_path):
+    if _source_missing(pdf_path):
         logger.error(f"PDF file not found at {pdf_path}")
-        return ""
+        return [], []
     
     try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        page_count = len(doc)
-        logger.info(f"PDF has {page_count} pages")
-        
-        for page_num in range(page_count):
-            page = doc.load_page(page_num)
-            page_text = page.get_text("text")
-            text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
-            logger.debug(f"Extracted {len(page_text)} characters from page {page_num + 1}")
+        page_texts, tables = [], []
+        missing_sections = set(_SECTION_HEADINGS).difference(found_sections) if stop_at_sections else set()
+        with _open_fitz(pdf_path) as doc:
+            logger.info(f"PDF has {len(doc)} pages")
+            page_count = min(len(doc), max_pages or len(doc))
+            
+            if workers and workers > 1 and not stop_at_sections and page_count - start_page >= _MIN_PARALLEL_PAGES:
+                logger.info(f"Extracting {page_count - start_page} pages in {workers} processes")
+                # Each worker would otherwise be sent its own copy of the bytes
+                page_texts, tables = _extract_pages_in_parallel(worker_path or pdf_path, start_page, page_count,
+                                                                workers, with_tables)
+            else:
+                debug = logger.isEnabledFor(logging.DEBUG)
+                for page_num in range(start_page + 1, page_count + 1):
+                    page = doc[page_num - 1]
+                    page_text = page.get_text("text", flags=_TEXT_FLAGS)
+                    page_texts.append(page_text)
+                    if debug:
+                        logger.debug(f"Extracted {len(page_text)} characters from page {page_num}")
+                    if with_tables:
+                        tables.extend(_extract_page_tables(page, page_num))
+                    
+                    if stop_at_sections:
+                        missing_sections.difference_update(match.lastgroup for match in _RE_SECTION_HEADING.finditer(page_text))
+                        if not missing_sections:
+                            logger.info(f"All key sections found by page {page_num}, skipping the remaining pages")
+                            break
         
-        doc.close()
-        logger.info(f"Completed text extraction: {len(text)} total characters")
-        return text
+        logger.info(f"Completed text extraction: {sum(map(len, page_texts))} total characters")
+        if with_tables:
+            logger.info(f"Completed table extraction: {len(tables)} tables found")
+        return page_texts, tables
         
     except Exception as e:
-        logger.error(f"Error processing PDF {pdf_path}: {str(e)}")
-        return ""
+        logger.error(f"Error processing PDF {_describe_source(pdf_path)}: {str(e)}")
+        return [], []
+
+def extract_page_texts(pdf_path: PdfSource, stop_at_sections: bool = False,
+                       max_pages: Optional[int] = None, workers: Optional[int] = None) -> List[str]:
+    """
+    Extracts the raw text of each page of a PDF file.
+    
+    Args:
+        pdf_path (PdfSource): Path to the PDF file, or its raw bytes
+        stop_at_sections (bool): Stop after the page on which the last key
+            section heading appears, instead of extracting every page
+        max_pages (Optional[int]): Only extract the first max_pages pages, all if None
+        workers (Optional[int]): Extract the pages of documents with at least
+            _MIN_PARALLEL_PAGES pages in this many processes. Leave unset when
+            already running in a worker pool. Ignored with stop_at_sections
+        
+    Returns:
+        List[str]: Text of each extracted page, empty if the PDF cannot be read
+    """
+    return _extract_pages(pdf_path, stop_at_sections, max_pages, workers, with_tables=False)[0]
+
+def extract_text_and_tables(pdf_path: PdfSource, stop_at_sections: bool = False, max_pages: Optional[int] = None,
+                            workers: Optional[int] = None,
+                            worker_path: Optional[str] = None) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Extracts the raw text and the tables of each page of a PDF file, opening
+    and walking the document once for both.
+    
+    Args:
+        pdf_path (PdfSource): Path to the PDF file, or its raw bytes
+        stop_at_sections (bool): Stop after the page on which the last key
+            section heading appears, instead of extracting every page
+        max_pages (Optional[int]): Only extract the first max_pages pages, all if None
+        workers (Optional[int]): Extract the pages of documents with at least
+            _MIN_PARALLEL_PAGES pages in this many processes. Leave unset when
+            already running in a worker pool. Ignored with stop_at_sections
+        worker_path (Optional[str]): Path of the file pdf_path's bytes were
+            read from, opened by the worker processes so the bytes are not
+            sent to each of them
+        
+    Returns:
+        Tuple[List[str], List[Dict[str, Any]]]: Text of each extracted page,
+            empty if the PDF cannot be read, and the tables found on those pages
+    """
+    return _extract_pages(pdf_path, stop_at_sections, max_pages, workers, with_tables=True, worker_path=worker_path)
+
+def join_page_texts(page_texts: List[str], include_page_markers: bool = False) -> str:
+    """
+    Joins page texts into the text of the whole document.
+    
+    Args:
+        page_texts (List[str]): Text of each page
+        include_page_markers (bool): Start each page with a "--- Page N ---"
+            line, needed by merge_tables_with_text
+        
+    Returns:
+        str: Document text
+    """
+    parts = []
+    for page_num, page_text in enumerate(page_texts, start=1):
+        parts.append(f"\n--- Page {page_num} ---\n" if include_page_markers else "\n\n")
+        parts.append(page_text)
+        parts.append("\n")
+    return "".join(parts)
+
+def extract_text_from_pdf(pdf_path: PdfSource, include_page_markers: bool = False,
+                          max_pages: Optional[int] = None) -> str:
+    """
+    Extracts raw text content from the pages of a PDF file.
+    
+    Args:
+        pdf_path (PdfSource): Path to the PDF file, or its raw bytes
+        include_page_markers (bool): Start each page with a "--- Page N ---"
+            line, needed by merge_tables_with_text
+        max_pages (Optional[int]): Only extract the first max_pages pages, all if None
+        
+    Returns:
+        str: Extracted text content from the extracted pages
+    """
+    return join_page_texts(extract_page_texts(pdf_path, max_pages=max_pages), include_page_markers)
 
-def extract_tables_from_pdf(pdf_path: str) -> List[Dict[str, Any]]:
+def extract_tables_from_pdf(pdf_path: PdfSource, max_pages: Optional[int] = None) -> List[Dict[str, Any]]:
     """
-    Extracts tables from a PDF file using pdfplumber with position information.
+    Extracts tables from a PDF file using PyMuPDF with position information.
     
     Args:
-        pdf_path (str): Path to the PDF file
+        pdf_path (PdfSource): Path to the PDF file, or its raw bytes
+        max_pages (Optional[int]): Only scan the first max_pages pages, all if None
         
     Returns:
         List[Dict[str, Any]]: List of extracted tables with page number, position and formatted content
     """
-    logger.info(f"Extracting tables from PDF: {os.path.basename(pdf_path)}")
+    logger.info(f"Extracting tables from PDF: {_describe_source(pdf_path)}")
     
-    if not os.path.exists(pdf_path):
+    if _source_missing(pdf_path):
         logger.error(f"PDF file not found at {pdf_path}")
         return []
     
     tables_with_position = []
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
+        with _open_fitz(pdf_path) as doc:
+            total_pages = min(len(doc), max_pages or len(doc))
             logger.info(f"Scanning {total_pages} pages for tables")
             
-            for page_num, page in enumerate(pdf.pages):
-                logger.debug(f"Extracting tables from page {page_num + 1}/{total_pages}")
-                page_tables = page.extract_tables()
-                
-                if page_tables:
-                    logger.info(f"Found {len(page_tables)} tables on page {page_num + 1}")
-                
-                for table_num, table in enumerate(page_tables):
-                    if table and len(table) > 0:
-                        # Format the table as a string
-                        table_str = f"\n--- TABLE START ---\n"
-                        
-                        # Calculate column widths for better formatting
-                        col_widths = [max(len(str(row[i])) if i < len(row) else 0 for row in table) for i in range(max(len(row) for row in table))]
-                        
-                        # Format each row
-                        for row in table:
-                            row_str = ""
-                            for i, cell in enumerate(row):
-                                cell_text = str(cell).strip() if cell else ""
-                                row_str += f"{cell_text:{col_widths[i] + 2}}"
-                            table_str += row_str + "\n"
-                        
-                        table_str += "--- TABLE END ---\n"
-                        
-                        # Get table position on page
-                        # Note: pdfplumber tables have bbox attribute (x0, top, x1, bottom)
-                        table_bbox = None
-                        if hasattr(page, 'find_tables') and callable(page.find_tables):
-                            tables_info = page.find_tables()
-                            if table_num < len(tables_info):
-                                table_bbox = tables_info[table_num].bbox
-                                logger.debug(f"Table {table_num + 1} position: {table_bbox}")
-                        
-                        tables_with_position.append({
-                            "page_num": page_num + 1,
-                            "table_num": table_num + 1,
-                            "content": table_str,
-                            "position": table_bbox  # This will be None if position can't be determined
-                        })
-                        
-                        logger.debug(f"Extracted table {table_num + 1} from page {page_num + 1} with {len(table)} rows")
+            debug = logger.isEnabledFor(logging.DEBUG)
+            for page_num in range(1, total_pages + 1):
+                if debug:
+                    logger.debug(f"Extracting tables from page {page_num}/{total_pages}")
+                tables_with_position.extend(_extract_page_tables(doc[page_num - 1], page_num))
         
         logger.info(f"Completed table extraction: {len(tables_with_position)} tables found")
         return tables_with_position
         
     except Exception as e:
-        logger.error(f"Error extracting tables from PDF {pdf_path}: {str(e)}")
+        logger.error(f"Error extracting tables from PDF {_describe_source(pdf_path)}: {str(e)}")
         return []
 
+def _collapse_spaces(text: str) -> str:
+    """
+    Collapses every run of spaces into one, except leading spaces at the very
+    start of the text, as re.sub(r'([^ ])  +', r'\\1 ', text) would. str.replace
+    runs in C without the regex engine's per-character overhead, and each pass
+    at least halves every run.
+    
+    Args:
+        text (str): Text to collapse
+        
+    Returns:
+        str: Text without runs of spaces
+    """
+    body = text.lstrip(' ')
+    leading = text[:len(text) - len(body)]
+    while '  ' in body:
+        body = body.replace('  ', ' ')
+    return leading + body
+
+def _clean_text_part(part: str) -> str:
+    """
+    Cleans a non-table part of the extracted text in a single pass over its lines.
+    
+    Strips trailing whitespace and form feeds from each line,
+    collapses runs of blank lines into one paragraph break and runs of spaces
+    into one space.
+    
+    Args:
+        part (str): Text between two tables
+        
+    Returns:
+        str: Cleaned text
+    """
+    lines = []
+    blanks = 0
+    for line in part.replace('\f', '').split('\n'):
+        line = line.rstrip()
+        if not line:
+            blanks += 1
+            continue
+        
+        # Keep at most one blank line between paragraphs, and up to two at the
+        # edges where the part meets a table
+        if lines:
+            if blanks:
+                lines.append('')
+        else:
+            lines.extend([''] * min(blanks, 2))
+        blanks = 0
+        lines.append(line)
+    lines.extend([''] * (min(blanks, 2) if lines else min(blanks, 3)))
+    
+    return _collapse_spaces('\n'.join(lines))
+
+def _percent(part: int, whole: int) -> str:
+    """Format part as a percentage of whole for log messages, 0.0% of nothing"""
+    return f"{part / whole * 100 if whole else 0.0:.1f}%"
+
 def clean_extracted_text(text: str) -> str:
     """
     Customize this heavily based on your PDF structure!
@@ -136,47 +541,27 @@ def clean_extracted_text(text: str) -> str:
     logger.info(f"Cleaning extracted text ({len(text)} characters)")
     
     # Split the text by table markers to preserve table formatting
-    table_pattern = r'(--- TABLE START ---[\s\S]*?--- TABLE END ---)'  
-    parts = re.split(table_pattern, text)
+    parts = _RE_TABLE.split(text)
     
+    # The pattern captures the tables, so split puts them at the odd indices
     logger.info(f"Text split into {len(parts)} parts for cleaning")
-    table_count = sum(1 for i, part in enumerate(parts) if i % 2 == 1 and re.match(table_pattern, part))
-    logger.info(f"Found {table_count} table sections to preserve")
+    logger.info(f"Found {len(parts) // 2} table sections to preserve")
     
+    debug = logger.isEnabledFor(logging.DEBUG)
     cleaned_parts = []
     for i, part in enumerate(parts):
-        # Check if this part is a table (matches our table marker pattern)
-        if i % 2 == 1 and re.match(table_pattern, part):
+        if i % 2 == 1:
             # This is a table section - preserve it exactly as is
-            logger.debug(f"Preserving table section {(i+1)//2} ({len(part)} characters)")
+            if debug:
+                logger.debug(f"Preserving table section {(i+1)//2} ({len(part)} characters)")
             cleaned_parts.append(part)
         else:
             # This is regular text - apply cleaning
-            original_length = len(part)
-            
-            # Remove excessive newlines (more than 2 consecutive)
-            cleaned_part = re.sub(r'\n{3,}', '\n\n', part)
-            
-            # Remove leading/trailing whitespace from each line while preserving indentation
-            # Use rstrip instead of strip to preserve leading spaces for formatting
-            cleaned_part = "\n".join([line.rstrip() for line in cleaned_part.split('\n')])
-            
-            # Remove extra spaces within lines (but preserve indentation)
-            cleaned_part = re.sub(r'([^ ])  +', r'\1 ', cleaned_part)
-            
-            # Remove page markers
-            cleaned_part = re.sub(r'--- Page \d+ ---', '', cleaned_part)
-            
-            # Remove common PDF artifacts
-            cleaned_part = re.sub(r'\f', '', cleaned_part)  # Form feed characters
-            cleaned_part = re.sub(r'\x0c', '', cleaned_part)  # Page break characters
+            cleaned_part = _clean_text_part(part)
             
-            # Remove empty lines but preserve paragraph breaks
-            cleaned_part = re.sub(r'\n\s*\n\s*\n+', '\n\n', cleaned_part)
-            
-            new_length = len(cleaned_part)
-            reduction = original_length - new_length
-            logger.debug(f"Cleaned text part {(i+1)//2}: {reduction} characters removed ({reduction/original_length*100:.1f}% reduction)")
+            if debug:
+                reduction = len(part) - len(cleaned_part)
+                logger.debug(f"Cleaned text part {(i+1)//2}: {reduction} characters removed ({_percent(reduction, len(part))} reduction)")
             
             cleaned_parts.append(cleaned_part)
     
@@ -184,7 +569,7 @@ def clean_extracted_text(text: str) -> str:
     result = ''.join(cleaned_parts)
     final_result = result.strip()
     
-    logger.info(f"Text cleaning complete: {len(text) - len(final_result)} characters removed ({(len(text) - len(final_result))/len(text)*100:.1f}% reduction)")
+    logger.info(f"Text cleaning complete: {len(text) - len(final_result)} characters removed ({_percent(len(text) - len(final_result), len(text))} reduction)")
     return final_result
 
 def identify_key_sections(text: str) -> Dict[str, str]:
@@ -198,22 +583,22 @@ def identify_key_sections(text: str) -> Dict[str, str]:
     Returns:
         Dict[str, str]: Dictionary with section names as keys and content as values
     """
+    # One anchored scan for the first heading line of each section
+    headings = {}
+    for match in _RE_SECTION_HEADING.finditer(text):
+        headings.setdefault(match.lastgroup, match)
+        if len(headings) == len(_SECTION_HEADINGS):
+            break
+    
+    # Each section runs from the first text after its heading to the next
+    # heading-like paragraph, so only the section itself is searched for its end
     sections = {}
-    
-    # Common section patterns for factory/operations reports
-    section_patterns = {
-        "executive_summary": r"(?:executive summary|summary|overview)\s*:?\s*\n(.*?)(?=\n\n[A-Z][^\n]*:?\s*\n|$)",
-        "daily_output": r"(?:daily output|production|output)\s*:?\s*\n(.*?)(?=\n\n[A-Z][^\n]*:?\s*\n|$)",
-        "anomalies": r"(?:anomalies|issues|problems|alerts)\s*:?\s*\n(.*?)(?=\n\n[A-Z][^\n]*:?\s*\n|$)",
-        "events": r"(?:events|incidents|activities)\s*:?\s*\n(.*?)(?=\n\n[A-Z][^\n]*:?\s*\n|$)",
-        "recommendations": r"(?:recommendations|actions|next steps)\s*:?\s*\n(.*?)(?=\n\n[A-Z][^\n]*:?\s*\n|$)",
-        "metrics": r"(?:metrics|kpis?|performance|statistics)\s*:?\s*\n(.*?)(?=\n\n[A-Z][^\n]*:?\s*\n|$)"
-    }
-    
-    for section_name, pattern in section_patterns.items():
-        match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-        if match:
-            sections[section_name] = match.group(1).strip()
+    for section_name in _SECTION_HEADINGS:
+        if section_name not in headings:
+            continue
+        start = _RE_WHITESPACE.match(text, headings[section_name].end()).end()
+        end = _RE_SECTION_END.search(text, start)
+        sections[section_name] = text[start:end.start() if end else len(text)].strip()
     
     # If no specific sections found, return the full text
     if not sections:
@@ -221,6 +606,76 @@ def identify_key_sections(text: str) -> Dict[str, str]:
     
     return sections
 
+def _iter_number_matches(text: str) -> Iterator[re.Match]:
+    """
+    Yields the same matches as _RE_NUMBER.finditer(text). With Hyperscan
+    installed, re only searches from just before each match instead of
+    scanning all the text in between. Without it, RE2 scans the text if
+    it is installed.
+    
+    Args:
+        text (str): Text content to analyze
+        
+    Returns:
+        Iterator[re.Match]: Non-overlapping matches, left to right. RE2
+            matches offer the same group, lastgroup and start methods
+    """
+    if _NUMBER_DATABASE is None:
+        if _RE2_NUMBER is not None:
+            try:
+                # RE2 works on UTF-8, which text with lone surrogates cannot be encoded to
+                yield from list(_RE2_NUMBER.finditer(text))
+                return
+            except UnicodeEncodeError:
+                pass
+        yield from _RE_NUMBER.finditer(text)
+        return
+    
+    try:
+        data = text.encode("utf-8")
+    except UnicodeEncodeError:
+        # Text with lone surrogates has no UTF-8 form for Hyperscan to scan
+        yield from _RE_NUMBER.finditer(text)
+        return
+    
+    # Hyperscan reports every offset where a match ends, with the leftmost start
+    # of a match ending there
+    spans = []
+    _NUMBER_DATABASE.scan(data, match_event_handler=lambda _id, start, end, _flags, _context: spans.append((end, start)))
+    if not spans:
+        return
+    spans.sort()
+    
+    # Hyperscan works on UTF-8 byte offsets, re on character offsets
+    if len(data) != len(text):
+        offsets = sorted({offset for span in spans for offset in span})
+        char_offsets = {}
+        byte_pos = char_pos = 0
+        for offset in offsets:
+            char_pos += len(data[byte_pos:offset].decode("utf-8", "ignore"))
+            byte_pos = offset
+            char_offsets[offset] = char_pos
+        spans = [(char_offsets[end], char_offsets[start]) for end, start in spans]
+    
+    ends = [end for end, _ in spans]
+    # Earliest start of any match ending at or after each span
+    first_starts = [start for _, start in spans]
+    for i in range(len(first_starts) - 2, -1, -1):
+        first_starts[i] = min(first_starts[i], first_starts[i + 1])
+    
+    pos = 0
+    while True:
+        # Every match starting at or after pos ends after pos, so none of them
+        # starts before the earliest start among the spans ending there
+        i = bisect.bisect_right(ends, pos)
+        if i == len(ends):
+            return
+        match = _RE_NUMBER.search(text, max(pos, first_starts[i]))
+        if match is None:
+            return
+        yield match
+        pos = match.end()
+
 def extract_numerical_data(text: str) -> List[Dict[str, str]]:
     """
     Extracts numerical data and metrics from the text.
@@ -233,22 +688,16 @@ def extract_numerical_data(text: str) -> List[Dict[str, str]]:
     """
     numerical_data = []
     
-    # Pattern to find numbers with units or context
-    patterns = [
-        r'(\d+(?:\.\d+)?)\s*(units?|pieces?|items?|kg|tons?|hours?|minutes?|%|percent)',
-        r'(\d+(?:\.\d+)?)\s*(efficiency|productivity|output|production)',
-        r'(temperature|pressure|speed|rate)\s*:?\s*(\d+(?:\.\d+)?)\s*(°[CF]|psi|rpm|%)?'
-    ]
-    
-    for pattern in patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            numerical_data.append({
-                "value": match.group(1) if len(match.groups()) >= 1 else match.group(0),
-                "unit": match.group(2) if len(match.groups()) >= 2 else "",
-                "context": match.group(0),
-                "position": match.start()
-            })
+    for match in _iter_number_matches(text):
+        # The unit of the temperature/pressure branch is optional, so its last
+        # matched group may be the value rather than the unit
+        branch = match.lastgroup[-1]
+        numerical_data.append({
+            "value": match.group("value" + branch),
+            "unit": match.group("unit" + branch) or "",
+            "context": match.group(0),
+            "position": match.start()
+        })
     
     return numerical_data
 
@@ -261,7 +710,8 @@ def merge_tables_with_text(text: str, tables: List[Dict[str, Any]]) -> str:
         tables (List[Dict[str, Any]]): List of tables with page numbers
         
     Returns:
-        str: Text with tables integrated at appropriate positions
+        str: Text with tables integrated at appropriate positions and the
+            page markers removed
     """
     logger.info(f"Merging {len(tables)} tables with text content")
     
@@ -274,13 +724,13 @@ def merge_tables_with_text(text: str, tables: List[Dict[str, Any]]) -> str:
         tables_by_page[page_num].append(table)
     
     logger.info(f"Tables grouped by page: {len(tables_by_page)} pages have tables")
-    for page, page_tables in tables_by_page.items():
-        logger.debug(f"Page {page}: {len(page_tables)} tables")
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        for page, page_tables in tables_by_page.items():
+            logger.debug(f"Page {page}: {len(page_tables)} tables")
     
-    # Split text by page markers
-    page_pattern = r'--- Page \d+ ---'
-    page_markers = re.finditer(page_pattern, text)
-    page_positions = [(m.start(), m.group()) for m in page_markers]
+    # Split text by page markers, reading each page number as the marker is found
+    page_positions = [(m.start(), m.end(), int(m.group(1))) for m in _RE_PAGE.finditer(text)]
     
     if not page_positions:
         # No page markers found, return original text
@@ -290,44 +740,33 @@ def merge_tables_with_text(text: str, tables: List[Dict[str, Any]]) -> str:
     logger.info(f"Found {len(page_positions)} page markers in text")
     
     # Add end position
-    page_positions.append((len(text), ""))
+    page_positions.append((len(text), len(text), 0))
     
     # Build new text with tables inserted
-    result_text = text[:page_positions[0][0]]
+    result_parts = [text[:page_positions[0][0]]]
     tables_inserted = 0
     
     for i in range(len(page_positions) - 1):
-        current_marker = page_positions[i][1]
-        current_pos = page_positions[i][0]
+        _, content_start, page_num = page_positions[i]
         next_pos = page_positions[i+1][0]
         
-        # Extract page number from marker
-        page_match = re.search(r'\d+', current_marker)
-        if not page_match:
-            logger.warning(f"Could not extract page number from marker: {current_marker}")
-            continue
-            
-        page_num = int(page_match.group())
-        page_content = text[current_pos:next_pos]
-        
-        logger.debug(f"Processing page {page_num} content ({len(page_content)} characters)")
+        if debug:
+            logger.debug(f"Processing page {page_num} content ({next_pos - content_start} characters)")
         
-        # Add page marker
-        result_text += current_marker
+        # The marker itself is dropped, it is only needed to locate the page
+        result_parts.append(text[content_start:next_pos])
         
         # Add page content with tables
         if page_num in tables_by_page:
             # For simplicity, add tables at the end of the page content
             # A more sophisticated approach would use table positions to insert at exact locations
-            page_text = page_content[len(current_marker):]
             for table in tables_by_page[page_num]:
-                page_text += table["content"]
+                result_parts.append(table["content"])
                 tables_inserted += 1
-                logger.debug(f"Inserted table {table['table_num']} into page {page_num}")
-            result_text += page_text
-        else:
-            result_text += page_content[len(current_marker):]
+                if debug:
+                    logger.debug(f"Inserted table {table['table_num']} into page {page_num}")
     
+    result_text = "".join(result_parts)
     logger.info(f"Merged {tables_inserted} tables into text, resulting in {len(result_text)} characters")
     return result_text
 
@@ -358,56 +797,115 @@ def save_processed_text(text: str, pdf_path: str, text_type: str) -> str:
     
     logger.debug(f"Writing {len(text)} characters to {output_path}")
     
-    # Save the text
+    # Save the text in slices, so only one slice is ever encoded at a time
+    # instead of a UTF-8 copy of the whole text
     with open(output_path, "w", encoding="utf-8") as f:
-        f.write(text)
+        for start in range(0, len(text), _DUMP_CHUNK_SIZE):
+            f.write(text[start:start + _DUMP_CHUNK_SIZE])
     
     print(f"Saved {text_type} text to {output_path}")
     return output_path
 
-def process_pdf_report(pdf_path: str) -> Dict[str, Any]:
+def process_pdf_report(pdf_path: PdfSource, filename: Optional[str] = None,
+                       cache_dir: Optional[str] = None, stop_at_sections: bool = False,
+                       page_workers: Optional[int] = None) -> Dict[str, Any]:
     """
     Complete pipeline to process a PDF report.
     
     Args:
-        pdf_path (str): Path to the PDF file
+        pdf_path (PdfSource): Path to the PDF file, or its raw bytes for
+            uploads that are already in memory
+        filename (Optional[str]): Name of the PDF, required when passing bytes.
+            Defaults to the basename of the path
+        cache_dir (Optional[str]): Directory to cache results in, keyed by the
+            SHA-256 of the PDF. A PDF with the same bytes is not parsed again
+        stop_at_sections (bool): Only process pages up to the one on which the
+            last key section heading appears, looking no further than the
+            first _SECTION_SEARCH_PAGES pages unless too few sections are found
+            there. Faster on long reports that lead with their key sections,
+            but the summary then omits later pages
+        page_workers (Optional[int]): Extract the text of long PDFs in this
+            many processes. Only worth it when nothing else is parsing at the
+            same time, e.g. for a single PDF from the command line
         
     Returns:
         Dict[str, Any]: Processed report data
     """
-    logger.info(f"Starting PDF processing pipeline for: {os.path.basename(pdf_path)}")
+    if filename is None:
+        if isinstance(pdf_path, bytes):
+            raise ValueError("filename is required when processing a PDF from bytes")
+        filename = os.path.basename(pdf_path)
+    
+    logger.info(f"Starting PDF processing pipeline for: {filename}")
     start_time = datetime.datetime.now()
     
-    # Extract text
-    logger.info("Step 1: Extracting text")
-    raw_text = extract_text_from_pdf(pdf_path)
-    if not raw_text:
+    memo_key = _memo_key(pdf_path, stop_at_sections)
+    if memo_key in _RESULT_MEMO:
+        _RESULT_MEMO.move_to_end(memo_key)
+        logger.info(f"Using the result of an earlier run on unchanged file {memo_key[0]}")
+        # A deep copy, so callers modifying their sections or numerical data do not modify the memo
+        return {**copy.deepcopy(_RESULT_MEMO[memo_key]), "filename": filename}
+    
+    # Hashing and PyMuPDF both read the whole file, so read it once and let
+    # them share the buffer. Page worker processes open the file themselves
+    worker_path = pdf_path if isinstance(pdf_path, str) else None
+    pdf_path = _read_pdf_once(pdf_path)
+    
+    if cache_dir is not None:
+        pdf_hash = content_hash(pdf_path)
+        if stop_at_sections:
+            pdf_hash += "_sections"
+        cached = load_cached(cache_dir, pdf_hash)
+        if cached is not None:
+            logger.info(f"Using cached parse result {pdf_hash}")
+            cached["filename"] = filename
+            return cached
+    
+    # Extract text and tables page by page, with tables taken from the pages
+    # the text was taken from
+    logger.info("Step 1: Extracting text and tables")
+    page_texts, tables = extract_text_and_tables(pdf_path, stop_at_sections,
+                                                 max_pages=_SECTION_SEARCH_PAGES if stop_at_sections else None,
+                                                 workers=page_workers, worker_path=worker_path)
+    if stop_at_sections and len(page_texts) == _SECTION_SEARCH_PAGES:
+        found_sections = {match.lastgroup for page_text in page_texts for match in _RE_SECTION_HEADING.finditer(page_text)}
+        if len(found_sections) < _MIN_SECTIONS_FOUND:
+            logger.info(f"Only {len(found_sections)} key sections in the first {_SECTION_SEARCH_PAGES} pages, extracting the rest")
+            # Continue after the pages already extracted instead of starting over
+            more_texts, more_tables = _extract_pages(pdf_path, stop_at_sections, None, page_workers, with_tables=True,
+                                                     start_page=len(page_texts), found_sections=found_sections,
+                                                     worker_path=worker_path)
+            page_texts.extend(more_texts)
+            tables.extend(more_tables)
+    if not page_texts:
         logger.error("Failed to extract text from PDF")
         return {"error": "Failed to extract text from PDF"}
     
-    # Save raw text for debugging
-    logger.info("Step 2: Saving raw text for debugging")
-    save_processed_text(raw_text, pdf_path, "raw")
+    # Page markers are only needed if there are tables to place by page
+    raw_text = join_page_texts(page_texts, include_page_markers=bool(tables))
     
-    # Extract tables with position information
-    logger.info("Step 3: Extracting tables")
-    tables = extract_tables_from_pdf(pdf_path)
+    # Save raw text for debugging
+    if DEBUG_DUMPS:
+        logger.info("Step 3: Saving raw text for debugging")
+        save_processed_text(raw_text, filename, "raw")
     
     # Merge tables with text at appropriate positions
     logger.info("Step 4: Merging tables with text")
-    merged_text = merge_tables_with_text(raw_text, tables)
+    merged_text = merge_tables_with_text(raw_text, tables) if tables else raw_text
     
     # Save merged text for debugging
-    logger.info("Step 5: Saving merged text for debugging")
-    save_processed_text(merged_text, pdf_path, "merged")
+    if DEBUG_DUMPS:
+        logger.info("Step 5: Saving merged text for debugging")
+        save_processed_text(merged_text, filename, "merged")
     
     # Clean text (after merging tables)
     logger.info("Step 6: Cleaning text")
     cleaned_text = clean_extracted_text(merged_text)
     
     # Save cleaned text for debugging
-    logger.info("Step 7: Saving cleaned text for debugging")
-    save_processed_text(cleaned_text, pdf_path, "cleaned")
+    if DEBUG_DUMPS:
+        logger.info("Step 7: Saving cleaned text for debugging")
+        save_processed_text(cleaned_text, filename, "cleaned")
     
     # Identify sections
     logger.info("Step 8: Identifying key sections")
@@ -420,7 +918,7 @@ def process_pdf_report(pdf_path: str) -> Dict[str, Any]:
     # Try to extract title from the text
     logger.info("Step 10: Extracting title")
     title = "Unknown Report"
-    title_match = re.search(r'^([^\n]+)', cleaned_text)
+    title_match = _RE_TITLE.search(cleaned_text)
     if title_match:
         title = title_match.group(1).strip()
         logger.info(f"Extracted title: {title}")
@@ -430,7 +928,7 @@ def process_pdf_report(pdf_path: str) -> Dict[str, Any]:
     # Prepare result
     logger.info("Step 11: Preparing result dictionary")
     result = {
-        "filename": os.path.basename(pdf_path),
+        "filename": filename,
         "title": title,
         "raw_text_length": len(raw_text),
         "cleaned_text_length": len(cleaned_text),
@@ -440,6 +938,16 @@ def process_pdf_report(pdf_path: str) -> Dict[str, Any]:
         "full_text": cleaned_text
     }
     
+    if cache_dir is not None:
+        result["content_hash"] = pdf_hash
+        store_cached(cache_dir, pdf_hash, result)
+    
+    if memo_key is not None:
+        # A deep copy, as the result's sections and numerical data belong to the caller
+        _RESULT_MEMO[memo_key] = copy.deepcopy(result)
+        if len(_RESULT_MEMO) > _RESULT_MEMO_SIZE:
+            _RESULT_MEMO.popitem(last=False)
+    
     end_time = datetime.datetime.now()
     processing_time = (end_time - start_time).total_seconds()
     
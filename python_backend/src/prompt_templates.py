@@ -0,0 +1,109 @@
+from typing import Final
+
+# Static output-format instructions appended to the summarizer prompts. They
+# are plain constants rather than f-strings, so they are built once when the
+# module is compiled and shared by every prompt.
+
+# Bump whenever a prompt changes, so summaries cached with the old prompt are not reused
+PROMPT_VERSION: Final[str] = "1"
+
+# Output format instructions for GeminiSummarizer
+GEMINI_SCHEMA: Final[str] = """
+
+You are an expert automotive marketing analyst and 3D technical artist for Satori XR.
+Your task is to analyze a car brochure's text and map its key selling points to a specific list of parts from a 3D model.
+
+**CONTEXT:**
+1.  **Brochure Text:** The following is the full text extracted from a product brochure.
+    ---
+    {brochure_text}
+    ---
+
+2.  **3D Model Part Names:** The 3D model contains the following named parts. You MUST map features to one of these exact names.
+    ```json
+    {json.dumps(part_names, indent=2)}
+    ```
+
+**INSTRUCTIONS:**
+1.  Read the entire brochure text to understand the car's main features.
+2.  Identify up to 8 of the most compelling and marketable features described.
+3.  For each feature, determine which of the provided "3D Model Part Names" is the most logical anchor point for a hotspot.
+4.  For each feature, create a short, catchy `feature_title` and a compelling one-sentence `marketing_summary`.
+5.  You MUST respond with ONLY a valid JSON object. The root of the object must be a key named `hotspots` which contains a list of the feature objects you identified.
+6.  If a feature cannot be reasonably mapped to any part in the list, omit it from the output.
+
+**REQUIRED JSON OUTPUT FORMAT:**
+```json
+{{
+  "hotspots": [
+    {{
+      "feature_title": "Example: Panoramic Sunroof",
+      "marketing_summary": "Example: Enjoy breathtaking views and an open-air feeling with the expansive, edge-to-edge panoramic sunroof.",
+      "matched_part_name": "roof_panel"
+    }},
+    {{
+      "feature_title": "Example: Diamond-Cut Alloy Wheels",
+      "marketing_summary": "Example: The stylish 17-inch diamond-cut alloy wheels provide a premium and sporty stance on the road.",
+      "matched_part_name": "wheel_front_left"
+    }}
+  ]
+}}```
+
+Ensure your response is ONLY valid JSON without any additional text or explanation. Extract the most important information from the report, focusing on key metrics, trends, and insights that would be valuable in an XR visualization environment.
+"""
+
+# Output format instructions for GPTSummarizer
+GPT_SCHEMA: Final[str] = """
+
+Please provide a JSON response with the following structure:
+{
+  "executive_summary": "Brief 2-3 sentence overview of the report",
+  "key_insights": [
+    "Insight 1",
+    "Insight 2",
+    "Insight 3"
+  ],
+  "daily_output": {
+    "total_production": "Number with unit",
+    "efficiency_rate": "Percentage",
+    "status": "Normal/Warning/Critical"
+  },
+  "anomalies": [
+    {
+      "type": "Equipment/Process/Quality",
+      "description": "Brief description",
+      "severity": "Low/Medium/High",
+      "impact": "Brief impact description"
+    }
+  ],
+  "events": [
+    {
+      "time": "Time if available",
+      "event": "Event description",
+      "category": "Maintenance/Production/Safety/Other"
+    }
+  ],
+  "recommendations": [
+    {
+      "priority": "High/Medium/Low",
+      "action": "Recommended action",
+      "timeline": "Suggested timeline"
+    }
+  ],
+  "metrics": {
+    "production_volume": "Number with unit",
+    "quality_score": "Percentage or score",
+    "downtime": "Time duration",
+    "energy_consumption": "Number with unit"
+  },
+  "dashboard_alerts": [
+    {
+      "level": "Info/Warning/Critical",
+      "message": "Alert message for XR display",
+      "action_required": true/false
+    }
+  ]
+}
+
+Ensure all numerical values include appropriate units. If specific data is not available, use "N/A" or reasonable estimates based on context.
+"""
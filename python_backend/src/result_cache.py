@@ -0,0 +1,312 @@
+import os
+import re
+import math
+import mmap
+import time
+import uuid
+import zlib
+import hashlib
+import operator
+import threading
+from array import array
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Union
+
+import orjson
+
+from src.utils import atomic_write
+
+# Set PDF_PIPELINE_CACHE=1 to reuse the parse result and summary of a PDF whose
+# exact bytes were already processed, instead of parsing and summarizing it again
+CACHE_ENABLED = os.getenv("PDF_PIPELINE_CACHE") == "1"
+
+# Name of the cache directory inside an output directory
+CACHE_DIRNAME = ".cache"
+
+# Set SEMANTIC_SUMMARY_CACHE=1 to reuse the summary of a previous report whose
+# text is nearly identical, not just byte-identical
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_SUMMARY_CACHE") == "1"
+SEMANTIC_CACHE_DIRNAME = ".sem_cache"
+
+_RE_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+def get_cache_dir(output_dir: str) -> Optional[str]:
+    """
+    Gets the cache directory for an output directory.
+
+    Args:
+        output_dir (str): Directory the summaries are saved to
+
+    Returns:
+        Optional[str]: Cache directory, None if caching is disabled
+    """
+    return os.path.join(output_dir, CACHE_DIRNAME) if CACHE_ENABLED else None
+
+def content_hash(pdf_source: Union[str, bytes]) -> str:
+    """
+    Generates the SHA-256 hash of a PDF's content.
+
+    Args:
+        pdf_source (Union[str, bytes]): Path to the PDF file, or its raw bytes
+
+    Returns:
+        str: Hex digest of the content
+    """
+    if isinstance(pdf_source, bytes):
+        return hashlib.sha256(pdf_source).hexdigest()
+
+    with open(pdf_source, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256(b"").hexdigest()
+        # Hash straight from the page cache instead of copying the file into Python
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+def text_hash(text: str) -> str:
+    """
+    Generates the SHA-256 hash of a text, such as a summary prompt.
+
+    Args:
+        text (str): Text to hash
+
+    Returns:
+        str: Hex digest of the UTF-8 encoded text
+    """
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+def summary_cache_key(content_key: str, model_name: str, prompt_version: str) -> str:
+    """
+    Generates the cache key of a summary. A summary depends on the model and
+    the prompt as well as the report, so changing either invalidates it.
+
+    Args:
+        content_key (str): Hash of the report content the summary is made from
+        model_name (str): Model used to summarize
+        prompt_version (str): Version of the summary prompt
+
+    Returns:
+        str: Cache key
+    """
+    key = f"{model_name}\0{prompt_version}\0{content_key}".encode("utf-8")
+    return "summary_" + hashlib.sha256(key).hexdigest()
+
+def load_cached(cache_dir: str, key: str) -> Optional[Dict[str, Any]]:
+    """
+    Loads a cached result.
+
+    Args:
+        cache_dir (str): Cache directory
+        key (str): Cache key
+
+    Returns:
+        Optional[Dict[str, Any]]: Cached result, None on a miss or unreadable entry
+    """
+    try:
+        with open(os.path.join(cache_dir, f"{key}.json"), "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+def store_cached(cache_dir: str, key: str, data: Dict[str, Any]) -> None:
+    """
+    Stores a result in the cache. The entry is written to a temporary file and
+    renamed into place, so concurrent readers never see a partial entry.
+
+    Args:
+        cache_dir (str): Cache directory
+        key (str): Cache key
+        data (Dict[str, Any]): Result to cache
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    atomic_write(os.path.join(cache_dir, f"{key}.json"), orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+
+def figures_key(numerical_data: List[Dict[str, Any]]) -> str:
+    """
+    Generates a key of the figures extracted from a report. Reports from the
+    same template share almost all of their words, so text similarity cannot
+    tell their figures apart; only reports with identical figures share a key.
+
+    Args:
+        numerical_data (List[Dict[str, Any]]): Numerical data extracted by the parser
+
+    Returns:
+        str: Hex digest of the values and units, in document order
+    """
+    figures = [(item.get("value"), (item.get("unit") or "").lower()) for item in numerical_data]
+    return hashlib.sha256(orjson.dumps(figures)).hexdigest()[:16]
+
+def embed_text(text: str, dim: int = 512) -> List[float]:
+    """
+    Embeds text as a unit-length vector of hashed term frequencies.
+
+    Args:
+        text (str): Text to embed
+        dim (int): Number of hash buckets
+
+    Returns:
+        List[float]: Normalized term frequency vector
+    """
+    counts = [0.0] * dim
+    for token in _RE_TOKEN.findall(text.lower()):
+        # crc32 rather than hash(), which is salted per process
+        counts[zlib.crc32(token.encode("utf-8")) % dim] += 1.0
+    norm = math.sqrt(sum(count * count for count in counts))
+    return [count / norm for count in counts] if norm else counts
+
+class SemanticSummaryCache:
+    """
+    Summaries of previous reports, looked up by the cosine similarity of their
+    text to a new report. Meant for batches of near-duplicate reports, e.g. the
+    daily report of one production line, where a summary of an almost identical
+    report is an acceptable answer. A summary is only reused for a report with
+    exactly the same figures, since those are what the summary reports on.
+
+    Each entry is a summary file plus a small vector file next to it, so
+    several worker processes can share the directory. Entry IDs start with the
+    figures key of their report. Entries expire `ttl` seconds after they are
+    stored, however often they are used, and the least recently used ones are
+    evicted beyond `max_entries`. The vector file's mtime is the time the
+    entry was stored and the summary file's mtime the time it was last used.
+    """
+
+    def __init__(self, cache_dir: str, threshold: float = 0.92, ttl: int = 7 * 86400,
+                 max_entries: int = 1000, dim: int = 512):
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.dim = dim
+        self._vectors: Dict[str, array] = {}
+        # The batch looks up and stores from several threads at once
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _embed_report(self, report_data: Dict[str, Any]) -> List[float]:
+        return embed_text(report_data.get("full_text", ""), self.dim)
+
+    @staticmethod
+    def _entry_prefix(report_data: Dict[str, Any]) -> str:
+        return figures_key(report_data.get("numerical_data", [])) + "_"
+
+    def _scan(self) -> Dict[str, float]:
+        """Sync the loaded vectors with the directory, dropping expired entries, and return when each entry was stored"""
+        expires_before = time.time() - self.ttl
+        mtimes = {}
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".vec"):
+                    continue
+                entry_id = entry.name[:-4]
+                mtime = entry.stat().st_mtime
+                if mtime < expires_before:
+                    self._remove(entry_id)
+                    continue
+                mtimes[entry_id] = mtime
+        
+        for entry_id in self._vectors.keys() - mtimes.keys():
+            del self._vectors[entry_id]
+        for entry_id in mtimes.keys() - self._vectors.keys():
+            vector = array("f")
+            try:
+                with open(os.path.join(self.cache_dir, f"{entry_id}.vec"), "rb") as f:
+                    vector.frombytes(f.read())
+            except OSError:
+                continue
+            if len(vector) == self.dim:
+                self._vectors[entry_id] = vector
+        return mtimes
+
+    def _remove(self, entry_id: str) -> None:
+        self._vectors.pop(entry_id, None)
+        for suffix in (".vec", ".json"):
+            try:
+                os.unlink(os.path.join(self.cache_dir, entry_id + suffix))
+            except FileNotFoundError:
+                pass
+
+    def lookup(self, report_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Finds the cached summary of the most similar previous report.
+
+        Args:
+            report_data (Dict[str, Any]): Processed report data
+
+        Returns:
+            Optional[Dict[str, Any]]: Summary of the closest report with the
+                same figures if it is at least `threshold` similar, None otherwise
+        """
+        prefix = self._entry_prefix(report_data)
+        with self._lock:
+            self._scan()
+            candidates = [(entry_id, vector) for entry_id, vector in self._vectors.items() if entry_id.startswith(prefix)]
+        if not candidates:
+            return None
+        
+        query = self._embed_report(report_data)
+        best_id, best_score = None, self.threshold
+        for entry_id, vector in candidates:
+            # Both vectors have unit length, so the dot product is the cosine
+            score = sum(map(operator.mul, query, vector))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+        if best_id is None:
+            return None
+        
+        summary = load_cached(self.cache_dir, best_id)
+        if summary is None:
+            return None
+        try:
+            # Mark the entry as recently used. The vector file keeps its mtime,
+            # so the entry still expires `ttl` after it was stored
+            os.utime(os.path.join(self.cache_dir, f"{best_id}.json"))
+        except OSError:
+            pass
+        summary.setdefault("metadata", {})["semantic_cache_similarity"] = round(best_score, 4)
+        return summary
+
+    def store(self, report_data: Dict[str, Any], summary: Dict[str, Any]) -> None:
+        """
+        Adds the summary of a report to the cache.
+
+        Args:
+            report_data (Dict[str, Any]): Processed report data
+            summary (Dict[str, Any]): Its summary
+        """
+        entry_id = self._entry_prefix(report_data) + uuid.uuid4().hex
+        vector = array("f", self._embed_report(report_data))
+        # The vector is written last, so an entry is only visible once complete
+        store_cached(self.cache_dir, entry_id, summary)
+        atomic_write(os.path.join(self.cache_dir, f"{entry_id}.vec"), vector.tobytes())
+        
+        with self._lock:
+            self._vectors[entry_id] = vector
+            mtimes = self._scan()
+            excess = len(mtimes) - self.max_entries
+            if excess > 0:
+                last_used = {entry_id: self._last_used(entry_id, stored) for entry_id, stored in mtimes.items()}
+                for stale_id in sorted(last_used, key=last_used.get)[:excess]:
+                    self._remove(stale_id)
+
+    def _last_used(self, entry_id: str, stored: float) -> float:
+        """When an entry was last looked up, or stored if never since"""
+        try:
+            return os.stat(os.path.join(self.cache_dir, f"{entry_id}.json")).st_mtime
+        except OSError:
+            return stored
+
+@lru_cache(maxsize=None)
+def get_semantic_cache(output_dir: str) -> Optional[SemanticSummaryCache]:
+    """
+    Gets the semantic summary cache for an output directory, shared by every
+    call in this process so loaded vectors are kept between reports.
+
+    Args:
+        output_dir (str): Directory the summaries are saved to
+
+    Returns:
+        Optional[SemanticSummaryCache]: Cache, None if semantic caching is disabled
+    """
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    return SemanticSummaryCache(os.path.join(output_dir, SEMANTIC_CACHE_DIRNAME), threshold)
@@ -0,0 +1,80 @@
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import redis.asyncio as redis
+
+class TaskStatusStore:
+    """
+    Status of background PDF tasks keyed by task ID.
+
+    Backed by Redis when a URL is given, so the status survives server
+    restarts and is shared by every uvicorn worker. Without one it falls back
+    to a process-local dict, which is only correct with a single worker.
+    Entries expire after `ttl` seconds either way.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, ttl: int = 86400):
+        self.ttl = ttl
+        self.redis = redis.Redis.from_url(redis_url, decode_responses=True) if redis_url else None
+        self._local: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    @staticmethod
+    def _key(task_id: str) -> str:
+        return f"task:{task_id}"
+
+    async def set(self, task_id: str, status: Dict[str, Any]) -> None:
+        """
+        Replaces the status of a task and restarts its expiry.
+
+        Args:
+            task_id (str): Task ID
+            status (Dict[str, Any]): Flat status dictionary
+        """
+        if self.redis is None:
+            self._local[task_id] = (time.monotonic() + self.ttl, status)
+            return
+
+        key = self._key(task_id)
+        mapping = {field: str(value) for field, value in status.items() if value is not None}
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Gets the status of a task.
+
+        Args:
+            task_id (str): Task ID
+
+        Returns:
+            Optional[Dict[str, Any]]: Task status, None if unknown or expired
+        """
+        if self.redis is None:
+            entry = self._local.get(task_id)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+        return await self.redis.hgetall(self._key(task_id)) or None
+
+    async def purge_expired(self) -> int:
+        """
+        Drops expired entries from the local fallback. Redis expires keys on
+        its own, so this is a no-op when Redis is configured.
+
+        Returns:
+            int: Number of entries removed
+        """
+        now = time.monotonic()
+        expired = [task_id for task_id, (expires_at, _) in self._local.items() if expires_at < now]
+        for task_id in expired:
+            del self._local[task_id]
+        return len(expired)
+
+    async def close(self) -> None:
+        """Closes the Redis connection pool, if any"""
+        if self.redis is not None:
+            await self.redis.aclose()
@@ -0,0 +1,61 @@
+import os
+from typing import Dict, Any, Union
+
+from src.pdf_parser import process_pdf_report
+from src.gemini_summarizer import get_summarizer
+from src.utils import generate_output_filename
+from src.result_cache import get_cache_dir
+
+def summarize_task(pdf_source: Union[str, bytes], original_filename: str, output_dir: str) -> Dict[str, Any]:
+    """
+    Parses a PDF and writes its Gemini summary. Runs inside a worker process,
+    so it must stay a picklable top-level function.
+
+    Args:
+        pdf_source (Union[str, bytes]): Path to the PDF file to process, or
+            its raw bytes for small uploads kept in memory
+        original_filename (str): Filename the PDF was uploaded as
+        output_dir (str): Directory to save the summary
+
+    Returns:
+        Dict[str, Any]: Final task status
+    """
+    try:
+        # Process the PDF
+        cache_dir = get_cache_dir(output_dir)
+        report_data = process_pdf_report(pdf_source, original_filename, cache_dir)
+
+        if "error" in report_data:
+            return {
+                "status": "error",
+                "filename": original_filename,
+                "error": report_data["error"]
+            }
+
+        # Generate summary using Gemini, reusing this worker's summarizer
+        summarizer = get_summarizer()
+        summary = summarizer.summarize_report(report_data, cache_dir)
+
+        # Save summary
+        output_filename = generate_output_filename(original_filename)
+        output_path = os.path.join(output_dir, output_filename)
+
+        summarizer.save_summary(summary, output_path)
+
+        metadata = summary.get("metadata", {})
+        return {
+            "status": "completed",
+            "filename": original_filename,
+            "output_file": output_filename,
+            "output_path": output_path,
+            "source_file": metadata.get("source_file", original_filename),
+            "timestamp": metadata.get("processing_timestamp", "Unknown"),
+            "model_used": metadata.get("model_used", "gemini-pro")
+        }
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "filename": original_filename,
+            "error": str(e)
+        }
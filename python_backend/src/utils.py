@@ -1,9 +1,14 @@
 import os
-import json
 import hashlib
+import time
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from pathlib import Path
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Iterator
+
+import orjson
+
+# Files are hashed in chunks of this size through one reused buffer
+HASH_CHUNK_SIZE = 1024 * 1024
 
 def ensure_directory_exists(directory_path: str) -> bool:
     """
@@ -22,22 +27,36 @@ def ensure_directory_exists(directory_path: str) -> bool:
         print(f"Error creating directory {directory_path}: {e}")
         return False
 
+@lru_cache(maxsize=256)
+def _hash_file(file_path: str, mtime_ns: int, size: int) -> str:
+    """
+    Hashes a file's contents. The modification time and size are only part of
+    the cache key, so an unchanged file is not read again.
+    """
+    file_hash = hashlib.sha256()
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while n := f.readinto(buffer):
+            file_hash.update(view[:n])
+    return file_hash.hexdigest()
+
 def get_file_hash(file_path: str) -> Optional[str]:
     """
-    Generates MD5 hash of a file for change detection.
+    Generates SHA-256 hash of a file for change detection. It is not used for
+    security; SHA-256 is chosen because OpenSSL hashes it with the CPU's SHA
+    extensions where available, which is faster than MD5. Hashes are reused
+    while the file's modification time and size stay the same.
     
     Args:
         file_path (str): Path to the file
         
     Returns:
-        Optional[str]: MD5 hash of the file, None if error
+        Optional[str]: SHA-256 hash of the file, None if error
     """
     try:
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        stat = os.stat(file_path)
+        return _hash_file(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
     except Exception as e:
         print(f"Error generating hash for {file_path}: {e}")
         return None
@@ -52,18 +71,17 @@ def validate_pdf_file(file_path: str) -> bool:
     Returns:
         bool: True if valid PDF, False otherwise
     """
-    if not os.path.exists(file_path):
-        return False
-    
     if not file_path.lower().endswith('.pdf'):
         return False
     
     try:
-        # Check PDF header
-        with open(file_path, 'rb') as f:
-            header = f.read(4)
-            return header == b'%PDF'
-    except Exception:
+        # Check PDF header with a raw descriptor; a missing file fails the open
+        fd = os.open(file_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            return os.read(fd, 4) == b'%PDF'
+        finally:
+            os.close(fd)
+    except OSError:
         return False
 
 def load_json_file(file_path: str) -> Optional[Dict[str, Any]]:
@@ -77,29 +95,63 @@ def load_json_file(file_path: str) -> Optional[Dict[str, Any]]:
         Optional[Dict[str, Any]]: Loaded JSON data, None if error
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(file_path, 'rb') as f:
+            return orjson.loads(f.read())
     except Exception as e:
         print(f"Error loading JSON file {file_path}: {e}")
         return None
 
-def save_json_file(data: Dict[str, Any], file_path: str, indent: int = 2) -> bool:
+def atomic_write(file_path: str, data: bytes, durable: bool = False) -> None:
+    """
+    Writes a file through a temporary file in the same directory and renames
+    it into place, so concurrent readers never see a partially written file.
+    
+    Args:
+        file_path (str): Path to save the file
+        data (bytes): Content to write
+        durable (bool): Flush the content to disk before the rename, so a crash
+            cannot leave an empty or truncated file in place of the old one
+    """
+    # Created with the same 0o666-minus-umask mode open() would give the file,
+    # which os.replace then keeps, unlike mkstemp's 0o600
+    tmp_path = f"{file_path}.{os.urandom(8).hex()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        f = os.fdopen(fd, 'wb')
+    except BaseException:
+        os.close(fd)
+        os.unlink(tmp_path)
+        raise
+    try:
+        with f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def save_json_file(data: Dict[str, Any], file_path: str, pretty: bool = False) -> bool:
     """
     Safely saves data to a JSON file.
     
     Args:
         data (Dict[str, Any]): Data to save
         file_path (str): Path to save the file
-        indent (int): JSON indentation level
+        pretty (bool): Indent the JSON for reading by hand instead of writing it compact
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        ensure_directory_exists(os.path.dirname(file_path))
+        directory = os.path.dirname(file_path)
+        if directory:
+            ensure_directory_exists(directory)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=indent, ensure_ascii=False)
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        atomic_write(file_path, orjson.dumps(data, option=option), durable=True)
         return True
     except Exception as e:
         print(f"Error saving JSON file {file_path}: {e}")
@@ -128,38 +180,71 @@ def generate_output_filename(source_pdf: str, suffix: str = "summary") -> str:
     Returns:
         str: Generated output filename
     """
-    base_name = Path(source_pdf).stem
+    base_name = os.path.splitext(os.path.basename(source_pdf))[0]
     timestamp = get_timestamp()
     return f"{base_name}_{suffix}_{timestamp}.json"
 
-def find_pdf_files(directory: str) -> List[str]:
+def iter_pdf_files(directory: str, recursive: bool = False) -> Iterator[str]:
     """
-    Finds all PDF files in a directory.
+    Finds PDF files in a directory, yielding each one as soon as it is found so
+    processing can start before the whole directory has been scanned. Files are
+    matched by name only; the PDF header is checked when a file is opened.
     
     Args:
         directory (str): Directory to search
+        recursive (bool): Also search subdirectories
         
     Returns:
-        List[str]: List of PDF file paths
+        Iterator[str]: PDF file paths
     """
-    pdf_files = []
-    
-    if not os.path.exists(directory):
-        print(f"Directory not found: {directory}")
-        return pdf_files
-    
     try:
-        for file in os.listdir(directory):
-            if file.lower().endswith('.pdf'):
-                file_path = os.path.join(directory, file)
-                if validate_pdf_file(file_path):
-                    pdf_files.append(file_path)
-                else:
-                    print(f"Invalid PDF file skipped: {file}")
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if recursive and entry.is_dir(follow_symlinks=False):
+                    yield from iter_pdf_files(entry.path, recursive)
+                elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                    yield entry.path
+    except FileNotFoundError:
+        # Opening the directory is the existence check, no separate stat needed
+        print(f"Directory not found: {directory}")
     except Exception as e:
         print(f"Error scanning directory {directory}: {e}")
+
+def find_pdf_files(directory: str, recursive: bool = False) -> List[str]:
+    """
+    Finds all PDF files in a directory.
     
-    return pdf_files
+    Args:
+        directory (str): Directory to search
+        recursive (bool): Also search subdirectories
+        
+    Returns:
+        List[str]: List of PDF file paths
+    """
+    return list(iter_pdf_files(directory, recursive))
+
+# Top-level fields every summary must have
+REQUIRED_SUMMARY_FIELDS = frozenset((
+    'executive_summary',
+    'key_insights',
+    'daily_output',
+    'anomalies',
+    'events',
+    'recommendations',
+    'metrics',
+    'dashboard_alerts'
+))
+
+# Required fields with a fixed type, and how that type is named in errors
+SUMMARY_FIELD_TYPES = (
+    ('key_insights', list, "a list"),
+    ('daily_output', dict, "a dictionary"),
+    ('anomalies', list, "a list"),
+    ('events', list, "a list"),
+    ('recommendations', list, "a list"),
+    ('metrics', dict, "a dictionary"),
+    ('dashboard_alerts', list, "a list")
+)
 
 def validate_summary_structure(summary: Dict[str, Any]) -> bool:
     """
@@ -171,52 +256,18 @@ def validate_summary_structure(summary: Dict[str, Any]) -> bool:
     Returns:
         bool: True if structure is valid, False otherwise
     """
-    required_fields = [
-        'executive_summary',
-        'key_insights',
-        'daily_output',
-        'anomalies',
-        'events',
-        'recommendations',
-        'metrics',
-        'dashboard_alerts'
-    ]
-    
     try:
         # Check required top-level fields
-        for field in required_fields:
-            if field not in summary:
-                print(f"Missing required field: {field}")
-                return False
-        
-        # Validate specific field types
-        if not isinstance(summary['key_insights'], list):
-            print("key_insights must be a list")
-            return False
-        
-        if not isinstance(summary['daily_output'], dict):
-            print("daily_output must be a dictionary")
-            return False
-        
-        if not isinstance(summary['anomalies'], list):
-            print("anomalies must be a list")
-            return False
-        
-        if not isinstance(summary['events'], list):
-            print("events must be a list")
-            return False
-        
-        if not isinstance(summary['recommendations'], list):
-            print("recommendations must be a list")
-            return False
-        
-        if not isinstance(summary['metrics'], dict):
-            print("metrics must be a dictionary")
+        missing = REQUIRED_SUMMARY_FIELDS - summary.keys()
+        if missing:
+            print(f"Missing required fields: {', '.join(sorted(missing))}")
             return False
         
-        if not isinstance(summary['dashboard_alerts'], list):
-            print("dashboard_alerts must be a list")
-            return False
+        # Validate specific field types
+        for field, field_type, type_name in SUMMARY_FIELD_TYPES:
+            if not isinstance(summary[field], field_type):
+                print(f"{field} must be {type_name}")
+                return False
         
         return True
         
@@ -224,6 +275,9 @@ def validate_summary_structure(summary: Dict[str, Any]) -> bool:
         print(f"Error validating summary structure: {e}")
         return False
 
+# Units used by format_file_size
+FILE_SIZE_UNITS = ("B", "KB", "MB", "GB")
+
 def format_file_size(size_bytes: int) -> str:
     """
     Formats file size in human-readable format.
@@ -237,14 +291,10 @@ def format_file_size(size_bytes: int) -> str:
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB"]
-    i = 0
+    # Every unit is 2**10 times the previous one, so the bit length gives the unit directly
+    i = min((size_bytes.bit_length() - 1) // 10, len(FILE_SIZE_UNITS) - 1)
     
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    
-    return f"{size_bytes:.1f} {size_names[i]}"
+    return f"{size_bytes / (1 << (10 * i)):.1f} {FILE_SIZE_UNITS[i]}"
 
 def get_file_info(file_path: str) -> Dict[str, Any]:
     """
@@ -319,11 +369,15 @@ class ProgressTracker:
     Simple progress tracker for batch operations.
     """
     
+    # Minimum seconds between progress lines, the final one is always printed
+    PRINT_INTERVAL = 0.1
+    
     def __init__(self, total: int, description: str = "Processing"):
         self.total = total
         self.current = 0
         self.description = description
-        self.start_time = datetime.now()
+        self.start_time = time.monotonic()
+        self._last_print = float("-inf")
     
     def update(self, increment: int = 1) -> None:
         """
@@ -337,13 +391,18 @@ class ProgressTracker:
     
     def _print_progress(self) -> None:
         """
-        Prints current progress.
+        Prints current progress, at most once per PRINT_INTERVAL.
         """
         if self.total > 0:
+            now = time.monotonic()
+            if self.current < self.total and now - self._last_print < self.PRINT_INTERVAL:
+                return
+            self._last_print = now
+            
             percentage = (self.current / self.total) * 100
-            elapsed = datetime.now() - self.start_time
+            elapsed = now - self.start_time
             
-            print(f"\r{self.description}: {self.current}/{self.total} ({percentage:.1f}%) - Elapsed: {elapsed}", end="")
+            print(f"\r{self.description}: {self.current}/{self.total} ({percentage:.1f}%) - Elapsed: {elapsed:.1f}s", end="")
             
             if self.current >= self.total:
                 print()  # New line when complete
@@ -366,7 +425,6 @@ if __name__ == "__main__":
     tracker = ProgressTracker(5, "Testing")
     for i in range(5):
         tracker.update()
-        import time
         time.sleep(0.1)
     
     print("Utility functions test completed.")
\ No newline at end of file
@@ -0,0 +1,38 @@
+import fitz
+import pytest
+
+from src import pdf_parser
+
+def build_pdf(pages, table=None) -> bytes:
+    """
+    Builds a PDF with one page per text in pages. If table is given, its rows
+    of cell texts are drawn as a ruled grid under the text of the first page.
+    A None cell is merged into the cell on its left.
+    """
+    doc = fitz.open()
+    for page_num, text in enumerate(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), text, fontsize=11)
+        if table and page_num == 0:
+            top, row_height, col_width = 200, 24, 120
+            rows, cols = len(table), len(table[0])
+            for r in range(rows + 1):
+                page.draw_line((72, top + r * row_height), (72 + cols * col_width, top + r * row_height))
+            for r, row in enumerate(table):
+                for c in range(cols + 1):
+                    if c < cols and row[c] is None:
+                        continue
+                    page.draw_line((72 + c * col_width, top + r * row_height), (72 + c * col_width, top + (r + 1) * row_height))
+                for c, cell in enumerate(row):
+                    if cell:
+                        page.insert_text((78 + c * col_width, top + r * row_height + 16), cell, fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+@pytest.fixture(autouse=True)
+def clear_result_memo():
+    """Keeps the in-process result memo from leaking between tests"""
+    pdf_parser._RESULT_MEMO.clear()
+    yield
+    pdf_parser._RESULT_MEMO.clear()
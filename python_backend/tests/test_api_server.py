@@ -0,0 +1,127 @@
+import asyncio
+import os
+import time
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from src import api_server
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A client whose uploads land in tmp_path, without the startup worker pool"""
+    monkeypatch.setattr(api_server, "INPUT_DIR", tmp_path / "input")
+    monkeypatch.setattr(api_server, "OUTPUT_DIR", tmp_path / "output")
+    os.makedirs(api_server.INPUT_DIR)
+    os.makedirs(api_server.OUTPUT_DIR)
+    return TestClient(api_server.app)
+
+@pytest.fixture
+def worker_inputs(monkeypatch):
+    """Records what each background task would hand to the worker, read when the task runs"""
+    inputs = []
+    async def fake_background(task_id, pdf_source, original_filename):
+        if isinstance(pdf_source, str):
+            with open(pdf_source, "rb") as f:
+                inputs.append((original_filename, f.read()))
+        else:
+            inputs.append((original_filename, pdf_source))
+    monkeypatch.setattr(api_server, "process_pdf_background", fake_background)
+    return inputs
+
+def test_large_uploads_with_the_same_name_keep_their_own_input(client, worker_inputs, monkeypatch):
+    monkeypatch.setattr(api_server, "SMALL_UPLOAD_SIZE", 8)
+    first, second = b"%PDF-first upload", b"%PDF-second upload"
+    
+    # Both files are written before either task runs, as when the uploads overlap
+    sources = []
+    monkeypatch.setattr(api_server.BackgroundTasks, "add_task",
+                        lambda self, func, *args: sources.append((func, args)))
+    for content in (first, second):
+        response = client.post("/process-pdf/", files={"file": ("report.pdf", content, "application/pdf")})
+        assert response.status_code == 200
+    
+    paths = [args[1] for func, args in sources if func is api_server.process_pdf_background]
+    assert len(set(paths)) == 2
+    for path, content in zip(paths, (first, second)):
+        with open(path, "rb") as f:
+            assert f.read() == content
+
+def test_large_upload_keeps_a_copy_under_its_name(client, worker_inputs, monkeypatch):
+    monkeypatch.setattr(api_server, "SMALL_UPLOAD_SIZE", 8)
+    content = b"%PDF-large upload"
+    response = client.post("/process-pdf/", files={"file": ("report.pdf", content, "application/pdf")})
+    assert response.status_code == 200
+    assert worker_inputs == [("report.pdf", content)]
+    with open(api_server.INPUT_DIR / "report.pdf", "rb") as f:
+        assert f.read() == content
+
+def test_small_upload_is_parsed_from_memory_and_still_kept(client, worker_inputs):
+    content = b"%PDF-small upload"
+    response = client.post("/process-pdf/", files={"file": ("small.pdf", content, "application/pdf")})
+    assert response.status_code == 200
+    assert worker_inputs == [("small.pdf", content)]
+    assert os.listdir(api_server.INPUT_DIR) == ["small.pdf"]
+    with open(api_server.INPUT_DIR / "small.pdf", "rb") as f:
+        assert f.read() == content
+
+def _write_summary(name: str, source_file: str):
+    with open(api_server.OUTPUT_DIR / name, "wb") as f:
+        f.write(orjson.dumps({"metadata": {"source_file": source_file, "processing_timestamp": "t", "model_used": "m"}}))
+
+@pytest.fixture
+def summary_index(client, monkeypatch):
+    monkeypatch.setattr(api_server, "SUMMARY_INDEX", {})
+    monkeypatch.setattr(api_server, "summary_index_mtime", None)
+    monkeypatch.setattr(api_server, "summary_index_lock", None)
+    return api_server.SUMMARY_INDEX
+
+def test_summary_deleted_during_refresh_is_skipped(summary_index, monkeypatch):
+    _write_summary("a_summary.json", "a.pdf")
+    _write_summary("b_summary.json", "b.pdf")
+    scan = api_server.scan_summary_files
+    def scan_then_delete():
+        stats = scan()
+        os.unlink(api_server.OUTPUT_DIR / "b_summary.json")
+        return stats
+    monkeypatch.setattr(api_server, "scan_summary_files", scan_then_delete)
+    
+    asyncio.run(api_server.refresh_summary_index())
+    assert list(summary_index) == ["a_summary.json"]
+
+def test_recent_directory_change_is_not_trusted(summary_index):
+    _write_summary("a_summary.json", "a.pdf")
+    asyncio.run(api_server.refresh_summary_index())
+    assert api_server.summary_index_mtime is None
+    
+    # A directory last changed long enough ago is remembered
+    old = time.time_ns() - 10 * api_server.MTIME_RESOLUTION_NS
+    os.utime(api_server.OUTPUT_DIR, ns=(old, old))
+    asyncio.run(api_server.refresh_summary_index())
+    assert api_server.summary_index_mtime == old
+
+def test_concurrent_refreshes_build_one_index(summary_index):
+    for i in range(20):
+        _write_summary(f"{i:02}_summary.json", f"{i}.pdf")
+    async def refresh_twice():
+        await asyncio.gather(api_server.refresh_summary_index(), api_server.refresh_summary_index())
+    asyncio.run(refresh_twice())
+    assert sorted(summary_index) == [f"{i:02}_summary.json" for i in range(20)]
+
+def test_completed_task_is_indexed_from_its_status(summary_index, monkeypatch):
+    _write_summary("old_summary.json", "old.pdf")
+    asyncio.run(api_server.refresh_summary_index())
+    status = {
+        "status": "completed", "filename": "new.pdf", "output_file": "new_summary.json",
+        "output_path": "/out/new_summary.json", "source_file": "new.pdf", "timestamp": "t", "model_used": "m",
+    }
+    monkeypatch.setattr(api_server, "summarize_task", lambda *args: status)
+    async def run_task():
+        # No worker pool, so the default thread executor runs the task
+        await api_server.process_pdf_background("task", b"%PDF", "new.pdf")
+        return await api_server.task_store.get("task")
+    
+    assert asyncio.run(run_task()) == status
+    assert list(summary_index) == ["new_summary.json", "old_summary.json"]
+    assert summary_index["new_summary.json"]["file_path"] == "/out/new_summary.json"
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from src import gemini_summarizer
+from src.gemini_summarizer import GeminiSummarizer
+
+REPORT = {"filename": "report.pdf", "title": "Daily Report", "full_text": "Output 1200 units",
+          "sections": {}, "numerical_data": []}
+
+def test_async_summary_caching_runs_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    summarizer = GeminiSummarizer()
+    
+    cache_threads = []
+    load_cached, store_cached = gemini_summarizer.load_cached, gemini_summarizer.store_cached
+    def recording_load(*args):
+        cache_threads.append(threading.current_thread())
+        return load_cached(*args)
+    def recording_store(*args):
+        cache_threads.append(threading.current_thread())
+        return store_cached(*args)
+    monkeypatch.setattr(gemini_summarizer, "load_cached", recording_load)
+    monkeypatch.setattr(gemini_summarizer, "store_cached", recording_store)
+    async def fake_generate(report_data, prompt):
+        return {"executive_summary": "1200 units", "metadata": {"source_file": "report.pdf"}}
+    monkeypatch.setattr(summarizer, "_generate_summary_async", fake_generate)
+    
+    async def summarize_twice():
+        first = await summarizer.summarize_report_async(REPORT, str(tmp_path))
+        second = await summarizer.summarize_report_async(REPORT, str(tmp_path))
+        return first, second
+    first, second = asyncio.run(summarize_twice())
+    
+    assert second == first
+    # A miss and a store, then a hit, none of them on the loop's thread
+    assert len(cache_threads) == 3
+    assert threading.main_thread() not in cache_threads
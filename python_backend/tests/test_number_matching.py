@@ -0,0 +1,100 @@
+import random
+import sys
+
+import pytest
+
+from src import pdf_parser
+
+# Inputs where Hyperscan or RE2 once disagreed with re, with re's matches as
+# (start, end, lastgroup, text)
+COUNTEREXAMPLES = [
+    ("\x1c1\x1cefficiencytonrate", [(1, 13, "unit2", "1\x1cefficiency")]),
+    ("23ıtemperature", [(0, 6, "unit1", "23ıtem")]),
+    ("5 İtems at speed: 3 rpm", [(0, 7, "unit1", "5 İtems"), (11, 23, "unit3", "speed: 3 rpm")]),
+    ("12 Kg, preſſure 4", [(0, 5, "unit1", "12 Kg"), (7, 17, "value3", "preſſure 4")]),
+    ("٣٥ %", [(0, 4, "unit1", "٣٥ %")]),
+    # A Newa digit, which Hyperscan's Unicode tables do not know
+    ("35\U00011453 tons", [(0, 8, "unit1", "35\U00011453 tons")]),
+    # A Kawi digit, which re only knows from Unicode 15 (Python 3.12) on
+    ("7\U00011f53 hours", [(0, 8, "unit1", "7\U00011f53 hours")] if "\U00011f53".isdecimal() else []),
+    # A lone surrogate, which has no UTF-8 form
+    ("rate\x85:\x1f9\ud800 units", [(0, 8, "value3", "rate\x85:\x1f9")]),
+]
+
+_WORDS = ("units unit pieces items kg tons hours minutes % percent efficiency productivity "
+          "output production temperature pressure speed rate psi rpm °C °F").split()
+_SPECIAL = list("ıİKſ°:.%\x1c\x1d\x1f\x85 　\xa0\t\n ٣１")
+
+def _random_text(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(1, 8)):
+        roll = rng.random()
+        if roll < 0.35:
+            word = "".join(ch.upper() if rng.random() < 0.3 else ch for ch in rng.choice(_WORDS))
+            parts.append(word.replace(rng.choice("iks"), rng.choice("ıİKſ"), 1) if rng.random() < 0.2 else word)
+        elif roll < 0.65:
+            parts.append(str(rng.choice([rng.randint(0, 2000), round(rng.random() * 100, 2)])))
+        else:
+            parts.append(rng.choice(_SPECIAL))
+    # Arbitrary code points too, lone surrogates included
+    return "".join(ch if rng.random() > 0.1 else chr(rng.randrange(0x20, 0x20000)) for ch in "".join(parts))
+
+def _matches(text: str) -> list:
+    return [(m.start(), m.end(), m.lastgroup, m.group(0)) for m in pdf_parser._iter_number_matches(text)]
+
+@pytest.fixture(params=["re", "hyperscan", "re2"])
+def engine(request, monkeypatch):
+    """Makes _iter_number_matches use one engine"""
+    if request.param == "re":
+        monkeypatch.setattr(pdf_parser, "_NUMBER_DATABASE", None)
+        monkeypatch.setattr(pdf_parser, "_RE2_NUMBER", None)
+    elif request.param == "hyperscan":
+        if pdf_parser._NUMBER_DATABASE is None:
+            pytest.skip("hyperscan is not installed")
+    elif request.param == "re2":
+        if pdf_parser._RE2_NUMBER is None:
+            pytest.skip("google-re2 is not installed")
+        monkeypatch.setattr(pdf_parser, "_NUMBER_DATABASE", None)
+    return request.param
+
+@pytest.mark.parametrize("text, expected", COUNTEREXAMPLES)
+def test_counterexamples(engine, text, expected):
+    assert _matches(text) == expected
+
+def test_fuzzed_text_matches_like_re(engine):
+    rng = random.Random(0)
+    for _ in range(3000):
+        text = _random_text(rng)
+        assert _matches(text) == [(m.start(), m.end(), m.lastgroup, m.group(0)) for m in pdf_parser._RE_NUMBER.finditer(text)], repr(text)
+
+def test_ported_classes_cover_every_digit_and_space():
+    assert not any(chr(code).isdecimal() or chr(code).isspace()
+                   for code in range(pdf_parser._MAX_CLASS_CODE_POINT + 1, sys.maxunicode + 1))
+
+def _entry(value, unit, context, position):
+    return {"value": value, "unit": unit, "context": context, "position": position}
+
+# One case per branch of _RE_NUMBER, then how they combine
+NUMERICAL_DATA_CASES = [
+    ("Produced 1200 units and 3.5 tons",
+     [_entry("1200", "units", "1200 units", 9), _entry("3.5", "tons", "3.5 tons", 24)]),
+    ("92.5 efficiency today", [_entry("92.5", "efficiency", "92.5 efficiency", 0)]),
+    ("Temperature: 85 °C", [_entry("85", "°C", "Temperature: 85 °C", 0)]),
+    ("pressure 30 psi", [_entry("30", "psi", "pressure 30 psi", 0)]),
+    # Without a unit the match ends on value3, which still maps to a value
+    ("speed: 1500", [_entry("1500", "", "speed: 1500", 0)]),
+    # The % belongs to the rate, with no separate '95%' entry from the first branch
+    ("rate: 95%", [_entry("95", "%", "rate: 95%", 0)]),
+    # Entries come in document order, and the earlier branch wins where two could match
+    ("Output 40 kg, Temperature 70°F, then 88% efficiency, 12 production",
+     [_entry("40", "kg", "40 kg", 7), _entry("70", "°F", "Temperature 70°F", 14),
+      _entry("88", "%", "88%", 37), _entry("12", "production", "12 production", 53)]),
+    ("No figures here", []),
+]
+
+@pytest.mark.parametrize("text, expected", NUMERICAL_DATA_CASES)
+def test_extract_numerical_data(engine, text, expected):
+    assert pdf_parser.extract_numerical_data(text) == expected
+
+def test_unit_less_match_ends_on_value3():
+    assert [m.lastgroup for m in pdf_parser._RE_NUMBER.finditer("speed: 1500, pressure 2 psi")] == ["value3", "unit3"]
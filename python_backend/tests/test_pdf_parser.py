@@ -0,0 +1,166 @@
+import os
+
+import pytest
+
+from src import pdf_parser
+from src.pdf_parser import (
+    clean_extracted_text, extract_text_and_tables, identify_key_sections, join_page_texts,
+    merge_tables_with_text, process_pdf_report,
+)
+
+from conftest import build_pdf
+
+REPORT_PAGES = [
+    "Daily Report\n\nExecutive Summary\nThe line produced 1200 units.\n\nAnomalies\nTemperature: 85 °C on press 2.",
+    "Recommendations\nService press 2 within 24 hours.",
+]
+
+def _count_extractions(monkeypatch) -> list:
+    calls = []
+    extract = pdf_parser.extract_text_and_tables
+    def counting_extract(*args, **kwargs):
+        calls.append(args)
+        return extract(*args, **kwargs)
+    monkeypatch.setattr(pdf_parser, "extract_text_and_tables", counting_extract)
+    return calls
+
+def test_memo_hit_returns_fresh_result_with_new_filename(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "report.pdf"
+    pdf_path.write_bytes(build_pdf(REPORT_PAGES))
+    calls = _count_extractions(monkeypatch)
+    
+    first = process_pdf_report(str(pdf_path), filename="first.pdf")
+    assert first["numerical_data"]
+    first["numerical_data"].clear()
+    first["sections"]["injected"] = "changed by the caller"
+    
+    second = process_pdf_report(str(pdf_path), filename="second.pdf")
+    assert len(calls) == 1
+    assert second["filename"] == "second.pdf"
+    assert second["numerical_data"]
+    assert "injected" not in second["sections"]
+    
+    # Modifying a memo hit does not leak into the next hit either
+    second["numerical_data"][0]["value"] = "0"
+    third = process_pdf_report(str(pdf_path), filename="third.pdf")
+    assert third["numerical_data"][0]["value"] != "0"
+    assert third["numerical_data"] is not second["numerical_data"]
+
+def test_changed_mtime_forces_reparse(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "report.pdf"
+    pdf_path.write_bytes(build_pdf(REPORT_PAGES))
+    calls = _count_extractions(monkeypatch)
+    
+    process_pdf_report(str(pdf_path))
+    stat = os.stat(pdf_path)
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    process_pdf_report(str(pdf_path))
+    assert len(calls) == 2
+
+# Pinned outputs of clean_extracted_text. The single-pass cleaner is not
+# identical to the original regex passes on every input: those collapsed
+# spaces before dropping form feeds, so '  \x0c\x0c  a' kept two spaces
+# where the cleaner now keeps one.
+CLEANING_CASES = [
+    ("Line one   \n    indented  value\n\n\n\nNext  paragraph\x0c\n\x0c\nend",
+     "Line one\n indented value\n\nNext paragraph\n\nend"),
+    ("Intro\n\n\n--- TABLE START ---\n|  a  |  b  |\n--- TABLE END ---\n\n\n\n\nAfter   table",
+     "Intro\n\n--- TABLE START ---\n|  a  |  b  |\n--- TABLE END ---\n\nAfter table"),
+    ("--- TABLE START ---\n| x |\n--- TABLE END ---\n\n\n--- TABLE START ---\n| y |\n--- TABLE END ---",
+     "--- TABLE START ---\n| x |\n--- TABLE END ---\n\n--- TABLE START ---\n| y |\n--- TABLE END ---"),
+    ("  a\n  \x0c\x0c  a", "a\n a"),
+    ("    indented   text\n\n\n", "indented text"),
+    ("\x0c\x0c", ""),
+]
+
+@pytest.mark.parametrize("text, expected", CLEANING_CASES)
+def test_clean_extracted_text(text, expected):
+    assert clean_extracted_text(text) == expected
+
+def test_sections_with_headings_on_their_own_lines():
+    text = "Report\n\nExecutive Summary\nThe plant ran.\n\nMetrics:   \nOEE 85%"
+    assert identify_key_sections(text) == {"executive_summary": "The plant ran.", "metrics": "OEE 85%"}
+
+def test_headings_with_text_after_the_colon_are_not_sections():
+    # Key/value lines start with heading words too, so only a heading on a
+    # line of its own starts a section
+    text = ("Executive Summary: The plant ran at full capacity.\nOutput: 1200 units\nPerformance: 94%\n\n"
+            "Anomalies\nPress 2 overheated.\n\nRecommendations:\nService press 2.")
+    assert identify_key_sections(text) == {
+        "anomalies": "Press 2 overheated.",
+        "recommendations": "Service press 2.",
+    }
+
+def test_key_value_line_does_not_hide_the_real_section():
+    text = "Report\n\nOutput: 1200 units\n\nDaily Output\nLine 1 produced 1200 units."
+    assert identify_key_sections(text) == {"daily_output": "Line 1 produced 1200 units."}
+
+def test_keywords_inside_lines_are_not_headings():
+    text = "Output rose as production increased production\nThe summary of the day follows."
+    assert identify_key_sections(text) == {"full_report": text}
+
+def _count_page_extractions(monkeypatch) -> list:
+    pages = []
+    extract = pdf_parser._extract_page_tables
+    def counting_extract(page, page_num):
+        pages.append(page_num)
+        return extract(page, page_num)
+    monkeypatch.setattr(pdf_parser, "_extract_page_tables", counting_extract)
+    return pages
+
+@pytest.mark.parametrize("page_count", [pdf_parser._SECTION_SEARCH_PAGES, pdf_parser._SECTION_SEARCH_PAGES + 3])
+def test_section_search_extracts_each_page_once(tmp_path, monkeypatch, page_count):
+    # Too few headings in the first pages, so the rest of the report is read too
+    pages = [f"Page body {page_num} with 10 units" for page_num in range(1, page_count + 1)]
+    pages[-1] = "Recommendations\nService press 2."
+    pdf_path = tmp_path / "report.pdf"
+    pdf_path.write_bytes(build_pdf(pages))
+    extracted = _count_page_extractions(monkeypatch)
+    
+    result = process_pdf_report(str(pdf_path), stop_at_sections=True)
+    assert extracted == list(range(1, page_count + 1))
+    assert result["full_text"].count("Page body 1 ") == 1
+    assert "recommendations" in result["sections"]
+
+def test_tables_are_merged_as_padded_blocks(tmp_path):
+    table = [
+        ["Line", "Output", "Status"],
+        ["Press 1", "1200 units", "OK"],
+        ["Press 2", "", "Down"],
+        ["Total 2400 units", None, None],
+    ]
+    page_texts, tables = extract_text_and_tables(build_pdf(["Daily Report"], table=table))
+    assert [(t["page_num"], t["table_num"]) for t in tables] == [(1, 1)]
+    
+    merged_text = merge_tables_with_text(join_page_texts(page_texts, include_page_markers=True), tables)
+    # Empty and merged cells are padded like the others, and the page marker is gone
+    assert merged_text.endswith(
+        "\n--- TABLE START ---\n"
+        "Line              Output      Status  \n"
+        "Press 1           1200 units  OK      \n"
+        "Press 2                       Down    \n"
+        "Total 2400 units                      \n"
+        "--- TABLE END ---\n"
+    )
+    assert "--- Page" not in merged_text
+    assert merged_text.index("Daily Report") < merged_text.index("--- TABLE START ---")
+
+@pytest.mark.parametrize("from_path", [True, False])
+def test_page_workers_open_the_file_instead_of_receiving_its_bytes(tmp_path, monkeypatch, from_path):
+    data = build_pdf([f"Page body {page_num}" for page_num in range(1, pdf_parser._MIN_PARALLEL_PAGES + 1)])
+    pdf_path = tmp_path / "report.pdf"
+    pdf_path.write_bytes(data)
+    sources = []
+    extract = pdf_parser._extract_pages_in_parallel
+    def recording_extract(pdf_source, *args):
+        sources.append(pdf_source)
+        return extract(pdf_source, *args)
+    monkeypatch.setattr(pdf_parser, "_extract_pages_in_parallel", recording_extract)
+    
+    if from_path:
+        result = process_pdf_report(str(pdf_path), page_workers=2)
+    else:
+        result = process_pdf_report(data, filename="report.pdf", page_workers=2)
+    # Bytes are only sent to the workers when there is no file to open
+    assert sources == [str(pdf_path) if from_path else data]
+    assert "Page body 8" in result["full_text"]
@@ -0,0 +1,75 @@
+import os
+import random
+
+from src.pdf_parser import extract_numerical_data
+from src.result_cache import SemanticSummaryCache, embed_text
+
+# Words shared by every daily report of one production line
+_WORDS = ("line shift operator conveyor maintenance inspection quality batch "
+          "schedule machine station safety procedure checklist supervisor").split()
+_BOILERPLATE = " ".join(random.Random(0).choice(_WORDS) for _ in range(3000))
+
+def _report(figures: str) -> dict:
+    full_text = f"Daily Production Report\n{_BOILERPLATE}\nSummary: {figures}\n{_BOILERPLATE}"
+    return {"filename": "report.pdf", "full_text": full_text, "numerical_data": extract_numerical_data(full_text)}
+
+def test_same_template_with_different_figures_does_not_share_summary(tmp_path):
+    cache = SemanticSummaryCache(str(tmp_path))
+    first = _report("output 1200 units, efficiency 94%")
+    second = _report("output 310 units, efficiency 41%, critical anomalies")
+    
+    # Text similarity alone cannot tell these reports apart
+    cosine = sum(a * b for a, b in zip(embed_text(first["full_text"]), embed_text(second["full_text"])))
+    assert cosine > cache.threshold
+    
+    cache.store(first, {"executive_summary": "1200 units at 94% efficiency", "metadata": {}})
+    assert cache.lookup(second) is None
+
+def test_same_figures_share_summary(tmp_path):
+    cache = SemanticSummaryCache(str(tmp_path))
+    first = _report("output 1200 units, efficiency 94%")
+    cache.store(first, {"executive_summary": "1200 units at 94% efficiency", "metadata": {}})
+    
+    # A fresh cache object reads the entry back from disk
+    summary = SemanticSummaryCache(str(tmp_path)).lookup(_report("output 1200 units, efficiency 94%"))
+    assert summary["executive_summary"] == "1200 units at 94% efficiency"
+    assert summary["metadata"]["semantic_cache_similarity"] >= 0.92
+
+def test_difference_past_the_start_of_the_text_counts(tmp_path):
+    cache = SemanticSummaryCache(str(tmp_path))
+    first = _report("output 1200 units")
+    cache.store(first, {"executive_summary": "first", "metadata": {}})
+    
+    # Same figures, but a long tail of unrelated text
+    second = dict(first, full_text=first["full_text"][:8000] + " unrelated" * 5000)
+    assert cache.lookup(second) is None
+
+def _age(path, seconds: float):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+def test_entry_expires_after_ttl_even_when_used(tmp_path):
+    cache = SemanticSummaryCache(str(tmp_path), ttl=100)
+    report = _report("output 1200 units")
+    cache.store(report, {"executive_summary": "hot", "metadata": {}})
+    (vec_path,) = tmp_path.glob("*.vec")
+    
+    _age(vec_path, 60)
+    assert cache.lookup(report) is not None
+    # The hit does not reset the expiry
+    _age(vec_path, 60)
+    assert cache.lookup(report) is None
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = SemanticSummaryCache(str(tmp_path), max_entries=2)
+    older, newer = _report("output 1200 units"), _report("output 900 units")
+    cache.store(older, {"executive_summary": "older", "metadata": {}})
+    cache.store(newer, {"executive_summary": "newer", "metadata": {}})
+    for path in tmp_path.iterdir():
+        _age(path, 60)
+    
+    # Using the older entry makes the newer one the least recently used
+    assert cache.lookup(older)["executive_summary"] == "older"
+    cache.store(_report("output 42 units"), {"executive_summary": "third", "metadata": {}})
+    assert cache.lookup(older) is not None
+    assert cache.lookup(newer) is None
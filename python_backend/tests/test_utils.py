@@ -0,0 +1,49 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from src import utils
+from src.utils import atomic_write
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX file modes")
+def test_atomic_write_gives_the_mode_open_would(tmp_path):
+    old_umask = os.umask(0o022)
+    try:
+        atomic_write(str(tmp_path / "summary.json"), b"{}")
+        with open(tmp_path / "plain.json", "wb") as f:
+            f.write(b"{}")
+    finally:
+        os.umask(old_umask)
+    
+    assert stat.S_IMODE(os.stat(tmp_path / "summary.json").st_mode) == 0o644
+    assert stat.S_IMODE(os.stat(tmp_path / "plain.json").st_mode) == 0o644
+
+def test_atomic_write_replaces_existing_file(tmp_path):
+    path = tmp_path / "summary.json"
+    path.write_bytes(b"old")
+    atomic_write(str(path), b"new", durable=True)
+    assert path.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == ["summary.json"]
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc to count open descriptors")
+def test_atomic_write_cleans_up_when_fdopen_fails(tmp_path, monkeypatch):
+    def failing_fdopen(*args, **kwargs):
+        raise OSError("fdopen failed")
+    
+    open_fds = len(os.listdir("/proc/self/fd"))
+    monkeypatch.setattr(utils.os, "fdopen", failing_fdopen)
+    with pytest.raises(OSError):
+        atomic_write(str(tmp_path / "summary.json"), b"{}")
+    monkeypatch.undo()
+    
+    assert len(os.listdir("/proc/self/fd")) == open_fds
+    assert os.listdir(tmp_path) == []
+
+def test_save_json_file_is_compact_unless_pretty(tmp_path):
+    data = {"metrics": {"output": 1200}}
+    assert utils.save_json_file(data, str(tmp_path / "compact.json"))
+    assert utils.save_json_file(data, str(tmp_path / "pretty.json"), pretty=True)
+    assert (tmp_path / "compact.json").read_text() == '{"metrics":{"output":1200}}'
+    assert (tmp_path / "pretty.json").read_text() == '{\n  "metrics": {\n    "output": 1200\n  }\n}'